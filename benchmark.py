@@ -0,0 +1,328 @@
+"""Synthetic fleet benchmark for Process Guardian
+
+Runs a GuardianEngine over N dummy children, kills or hangs some of them at random and
+writes detection/restart latency, guardian CPU/RSS and sweep times as JSON:
+
+    python benchmark.py --fleet 500 --duration 60 --out bench-500.json
+
+With --compare-samplers it instead times each sampler backend (psutil, /proc) sweeping a
+process table padded with --fleet idle dummies, and reports sweep time and allocations:
+
+    python benchmark.py --compare-samplers --fleet 3000 --out samplers.json
+
+Each dummy is a hard link to `sleep`, so every entry has its own exe and name without
+costing any disk space. Hangs need a health probe to be noticed, so they only hit a small
+pool of tiny HTTP servers that are frozen with SIGSTOP. POSIX only.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import psutil
+
+HTTP_DUMMY = """import http.server, sys
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+    def log_message(self, *args):
+        pass
+
+http.server.ThreadingHTTPServer(("127.0.0.1", int(sys.argv[1])), Handler).serve_forever()
+"""
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+def link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)  # Different filesystem
+
+def stats(values):
+    """count/mean/percentiles/max of a list of numbers, rounded for the report"""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+    return {"count": len(ordered), "mean": round(sum(ordered) / len(ordered), 3), "p50": round(pct(50), 3),
+            "p95": round(pct(95), 3), "p99": round(pct(99), 3), "max": round(ordered[-1], 3)}
+
+def git_revision(path):
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=path, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def build_fleet(workdir, args):
+    """Writes the dummy binaries and returns the config's process list"""
+    sleep_bin = shutil.which("sleep")
+    processes = []
+    for i in range(args.fleet):
+        path = os.path.join(workdir, f"bench-{i:05d}")
+        link_or_copy(sleep_bin, path)
+        processes.append({"name": os.path.basename(path), "path": path, "args": "86400",
+                          "interval": args.interval, "enabled": True, "track_tree": False,
+                          # Random kills must never trip the crash-loop breaker
+                          "backoff_base": 0, "max_restarts": 10 ** 9})
+
+    if args.hang_pool:
+        with open(os.path.join(workdir, "dummy_http.py"), "w", encoding="utf-8") as f:
+            f.write(HTTP_DUMMY)
+    for i in range(args.hang_pool):
+        path = os.path.join(workdir, f"bench-http-{i:03d}")
+        link_or_copy(os.path.realpath(sys.executable), path)
+        port = args.port_base + i
+        processes.append({"name": os.path.basename(path), "path": path, "args": f"dummy_http.py {port}",
+                          "interval": args.interval, "enabled": True, "track_tree": False,
+                          "backoff_base": 0, "max_restarts": 10 ** 9,
+                          "probe": {"type": "http", "url": f"http://127.0.0.1:{port}/", "interval": 1,
+                                    "timeout": 1.0, "failures": 2, "grace": 3}})
+    return processes
+
+class Recorder:
+    """Engine listener that timestamps detections and restarts of injected faults"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.faults = {}  # proc id -> open fault
+        self.done = []
+        self.started = {}  # proc id -> monotonic time of the last start
+
+    def inject(self, proc, kind):
+        with self.lock:
+            self.faults[proc["id"]] = {"kind": kind, "at": time.monotonic(), "detected": None}
+
+    def __call__(self, proc, fields):
+        now = time.monotonic()
+        with self.lock:
+            fault = self.faults.get(proc["id"])
+            status = fields.get("status", "")
+            if fault is not None and fault["detected"] is None and status.startswith(("🔴", "🟡 Not")):
+                fault["detected"] = now
+            if "restarts" in fields:
+                self.started[proc["id"]] = now
+                if fault is not None:
+                    fault["restarted"] = now
+                    if fault["detected"] is None: fault["detected"] = now
+                    self.done.append(self.faults.pop(proc["id"]))
+
+def load_guardian(workdir):
+    # The guardian logs to the working directory at import time; keep the benchmark's log out of the repo
+    os.chdir(workdir)
+    sys.path.insert(0, REPO)
+    import process_guardian
+    return process_guardian
+
+def environment():
+    return {"guardian_revision": git_revision(REPO), "python": platform.python_version(),
+            "psutil": psutil.__version__, "platform": platform.platform(), "cpu_count": os.cpu_count()}
+
+def compare_samplers(args):
+    """Sweep time, allocations and per-process sample cost of each sampler backend"""
+    workdir = tempfile.mkdtemp(prefix="guardian-bench-")
+    cwd = os.getcwd()
+    process_guardian = load_guardian(workdir)
+    
+    # Pad the process table with idle dummies so the sweep has thousands of entries to walk
+    dummies = [subprocess.Popen([shutil.which("sleep"), "3600"]) for _ in range(args.fleet)]
+    backends = [process_guardian.PsutilBackend()]
+    if process_guardian.ProcfsBackend.available():
+        backends.append(process_guardian.ProcfsBackend())
+    
+    report = dict(environment(), params={"fleet": args.fleet, "repeat": args.repeat}, backends={})
+    try:
+        for backend in backends:
+            scanner = process_guardian.ProcessScanner(max_age=0, backend=backend)
+            sampler = process_guardian.CpuSampler(backend)
+            scanner.sweep()  # Warm-up: psutil caches its Process objects between sweeps
+            
+            sweep_ms = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                scanner.sweep()
+                sweep_ms.append((time.perf_counter() - start) * 1000)
+            
+            sample_us = []
+            targets = [psutil.Process(p.pid) for p in dummies[:200]]
+            for process in targets:
+                start = time.perf_counter()
+                sampler.sample(process)
+                sample_us.append((time.perf_counter() - start) * 1e6)
+            
+            # Allocations are traced separately because tracemalloc slows every allocation down
+            peak_kb, blocks = [], []
+            tracemalloc.start()
+            for _ in range(min(args.repeat, 5)):
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                snapshot = tracemalloc.take_snapshot()
+                scanner.sweep()
+                peak_kb.append((tracemalloc.get_traced_memory()[1] - before) / 1024)
+                stats_diff = tracemalloc.take_snapshot().compare_to(snapshot, "filename")
+                blocks.append(sum(stat.count_diff for stat in stats_diff if stat.count_diff > 0))
+            tracemalloc.stop()
+            
+            report["backends"][backend.name] = {"processes": scanner.proc_count, "sweep_ms": stats(sweep_ms),
+                                                "sample_us": stats(sample_us), "sweep_peak_kb": stats(peak_kb),
+                                                "sweep_retained_blocks": stats(blocks)}
+    finally:
+        for popen in dummies:
+            popen.kill()
+            popen.wait()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="guardian-bench-")
+    cwd = os.getcwd()
+    process_guardian = load_guardian(workdir)
+
+    rng = random.Random(args.seed)
+    config = os.path.join(workdir, "bench_config.json")
+    with open(config, "w", encoding="utf-8") as f:
+        json.dump({"processes": build_fleet(workdir, args)}, f)
+
+    engine = process_guardian.GuardianEngine(config)
+    recorder = Recorder()
+    engine.listener = recorder
+
+    sweep_ms = []
+    scanner = engine.scanner
+    sweep = scanner.sweep
+    def timed_sweep():
+        sweep()
+        sweep_ms.append(scanner.last_ms)
+    scanner.sweep = timed_sweep
+
+    me = psutil.Process()
+    me.cpu_percent()
+
+    # Launch the fleet and wait until every entry has been started once
+    t0 = time.monotonic()
+    engine.start_all()
+    total = len(engine.processes)
+    while len(recorder.started) < total and time.monotonic() - t0 < args.startup_timeout:
+        time.sleep(0.05)
+    startup = time.monotonic() - t0
+
+    cpu, rss = [], []
+    injected = {"kill": 0, "hang": 0}
+    hang_pool = [p for p in engine.processes if p.get("probe")]
+    kill_pool = [p for p in engine.processes if not p.get("probe")]
+    next_sample = time.monotonic() + 1
+    end = time.monotonic() + args.duration
+    while time.monotonic() < end:
+        time.sleep(rng.expovariate(args.fault_rate) if args.fault_rate > 0 else 1)
+        now = time.monotonic()
+        if now >= next_sample:
+            cpu.append(me.cpu_percent())
+            rss.append(me.memory_info().rss / 1024 / 1024)
+            next_sample = now + 1
+        if args.fault_rate <= 0 or now >= end:
+            continue
+
+        kind = "hang" if hang_pool and rng.random() < args.hang_ratio else "kill"
+        pool = hang_pool if kind == "hang" else kill_pool
+        # Victims must be up and past their probe grace period, with no fault pending
+        candidates = [p for p in pool if p["id"] not in recorder.faults and p.get("popen") is not None
+                      and now - recorder.started.get(p["id"], now) > 5]
+        if not candidates:
+            continue
+        proc = rng.choice(candidates)
+        recorder.inject(proc, kind)
+        try:
+            os.kill(proc["popen"].pid, signal.SIGSTOP if kind == "hang" else signal.SIGKILL)
+            injected[kind] += 1
+        except OSError:
+            recorder.faults.pop(proc["id"], None)
+
+    # Let pending faults settle before reading the results
+    settle = time.monotonic() + args.settle
+    while recorder.faults and time.monotonic() < settle:
+        time.sleep(0.1)
+
+    engine.stop_all()
+    for proc in engine.processes:
+        popen = proc.get("popen")
+        if popen is not None and popen.poll() is None:
+            try:
+                os.kill(popen.pid, signal.SIGCONT)
+                popen.kill()
+                popen.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+    engine.close()
+
+    report = {
+        **environment(),
+        "sampler": engine.scanner.backend.name,
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare_samplers", "repeat")},
+        "startup_seconds": round(startup, 3),
+        "started": len(recorder.started),
+        "faults": {},
+        "guardian": {"cpu_percent": stats(cpu), "rss_mb": stats(rss), "checks": engine.scheduler.checks},
+        "sweep_ms": stats(sweep_ms),
+    }
+    for kind in ("kill", "hang"):
+        done = [f for f in recorder.done if f["kind"] == kind]
+        report["faults"][kind] = {
+            "injected": injected[kind],
+            "recovered": len(done),
+            "unrecovered": injected[kind] - len(done),
+            "detection_ms": stats([(f["detected"] - f["at"]) * 1000 for f in done]),
+            "restart_ms": stats([(f["restarted"] - f["at"]) * 1000 for f in done]),
+        }
+
+    os.chdir(cwd)
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Process Guardian against a synthetic process fleet")
+    parser.add_argument("--fleet", type=int, default=100, help="dummy processes to monitor (default: %(default)s)")
+    parser.add_argument("--hang-pool", type=int, default=5, help="probed HTTP dummies that hangs are injected into (default: %(default)s)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of fault injection (default: %(default)s)")
+    parser.add_argument("--fault-rate", type=float, default=2.0, help="injected faults per second, 0 for an idle run (default: %(default)s)")
+    parser.add_argument("--hang-ratio", type=float, default=0.1, help="fraction of faults that are hangs (default: %(default)s)")
+    parser.add_argument("--interval", type=float, default=5, help="check interval of every entry (default: %(default)s)")
+    parser.add_argument("--port-base", type=int, default=28000, help="first port of the HTTP dummies (default: %(default)s)")
+    parser.add_argument("--startup-timeout", type=float, default=120, help="seconds to wait for the fleet to come up (default: %(default)s)")
+    parser.add_argument("--settle", type=float, default=15, help="seconds to wait for pending faults at the end (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed, for reproducible fault schedules (default: %(default)s)")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary fleet directory and its event log")
+    parser.add_argument("--compare-samplers", action="store_true", help="compare sampler backends instead of running the fleet")
+    parser.add_argument("--repeat", type=int, default=20, help="sweeps per backend with --compare-samplers (default: %(default)s)")
+    args = parser.parse_args()
+    if os.name != "posix":
+        parser.error("the benchmark needs POSIX signals (SIGKILL/SIGSTOP)")
+    if args.out: args.out = os.path.abspath(args.out)
+
+    report = compare_samplers(args) if args.compare_samplers else run(args)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,2835 @@
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog, font, scrolledtext
 import subprocess
 import psutil
 import threading
 import time
 import os
 import json
+import socket
 from pathlib import Path
 import sys
 import logging
+from logging.handlers import RotatingFileHandler
+import collections
+from array import array
 import shlex # Added for security
+import selectors
+import heapq
+import bisect
+import struct
+import itertools
+from concurrent.futures import ThreadPoolExecutor, Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import argparse
+import signal
+import tempfile
+import stat
+import uuid
+import random
+import asyncio
+import ssl
+import urllib.parse
 
-# Setup logging system
+# tkinter is imported by load_gui() so headless runs never pay for it
+tk = ttk = messagebox = filedialog = font = scrolledtext = None
+
+class LatencyHistogram:
+    """Log2-bucketed latency histogram; an observation is one bit_length() and a few increments"""
+    BUCKETS = 26  # Upper bounds 1 µs, 2 µs, 4 µs ... 2**24 µs (~17 s), then +Inf
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = array('Q', bytes(8 * self.BUCKETS))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        bucket = min(int(seconds * 1e6).bit_length(), self.BUCKETS - 1)
+        with self.lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max: self.max = seconds
+
+    def bound(self, bucket):
+        return float("inf") if bucket == self.BUCKETS - 1 else (1 << bucket) / 1e6
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile, capped at the largest observation"""
+        rank, seen = p / 100 * self.count, 0
+        for bucket, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(self.bound(bucket), self.max)
+        return self.max
+
+class PhaseTimer:
+    __slots__ = ('timings', 'phase', 'start')
+
+    def __init__(self, timings, phase):
+        self.timings = timings
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.timings.observe(self.phase, time.perf_counter() - self.start)
+
+class PhaseTimings:
+    """Latency histograms for each phase of the monitoring cycle (sweep, sample, check, restart, ...)"""
+    def __init__(self):
+        self.phases = {}
+
+    def observe(self, phase, seconds):
+        histogram = self.phases.get(phase)
+        if histogram is None:
+            histogram = self.phases.setdefault(phase, LatencyHistogram())
+        histogram.observe(seconds)
+
+    def phase(self, name):
+        """with timings.phase("sweep"): ... records the block's duration"""
+        return PhaseTimer(self, name)
+
+    def summary_text(self):
+        parts = []
+        for name, h in sorted(self.phases.items()):
+            parts.append(f"{name} n={h.count} p50={h.percentile(50) * 1000:.2f}ms "
+                         f"p99={h.percentile(99) * 1000:.2f}ms max={h.max * 1000:.2f}ms")
+        return "; ".join(parts)
+
+timings = PhaseTimings()
+
+class InstrumentedFileHandler(RotatingFileHandler):
+    """Rotating event log that also times its own writes"""
+    def emit(self, record):
+        with timings.phase("log"):
+            super().emit(record)
+
+LOG_FILE = 'guardian_events.log'
+
+# Setup logging system (rotated by size so the file never grows without bound)
 logging.basicConfig(
-    filename='guardian_events.log',
+    handlers=[InstrumentedFileHandler(LOG_FILE, maxBytes=5 * 1024 * 1024, backupCount=5, encoding='utf-8')],
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 
+class PsutilBackend:
+    """Portable process table access through psutil"""
+    name = "psutil"
+    has_exe = True  # scan() reports exe paths, so the scanner can index them up front
+
+    def scan(self):
+        """Yields (pid, ppid, name, exe, handle) for every process; the handle is what process() turns into a psutil.Process"""
+        for p in psutil.process_iter(['name', 'exe', 'ppid']):
+            yield p.pid, p.info['ppid'], p.info['name'], p.info['exe'], p
+
+    def read(self, process):
+        """(status, cpu_seconds, rss_bytes, identity) of one process; identity changes when the PID is reused"""
+        with process.oneshot():
+            status = process.status()
+            times = process.cpu_times()
+            rss = process.memory_info().rss
+            return status, times.user + times.system, rss, process.create_time()
+
+    def process(self, pid, handle):
+        return handle
+
+    def exe(self, pid, handle):
+        return None
+
+    def prune(self, live_pids):
+        pass
+
+class ProcfsBackend:
+    """Linux fast path: /proc/<pid>/stat (and statm when sampling) read into a reused buffer, no psutil objects"""
+    name = "procfs"
+    has_exe = False  # exe links are only resolved for processes whose name already matches
+    STATUSES = {"R": psutil.STATUS_RUNNING, "S": psutil.STATUS_SLEEPING, "D": psutil.STATUS_DISK_SLEEP,
+                "Z": psutil.STATUS_ZOMBIE, "T": psutil.STATUS_STOPPED, "t": psutil.STATUS_TRACING_STOP,
+                "X": psutil.STATUS_DEAD, "x": psutil.STATUS_DEAD, "I": psutil.STATUS_IDLE,
+                "W": psutil.STATUS_WAKING, "P": psutil.STATUS_PARKED}
+
+    def __init__(self, root="/proc"):
+        self.root = root
+        self.ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.local = threading.local()  # Per-thread read buffer
+        self.lock = threading.Lock()
+        self.handles = {}  # pid -> (start time, psutil.Process), created on first use
+        self.exes = {}  # pid -> (start time, exe path)
+
+    @staticmethod
+    def available():
+        return sys.platform.startswith("linux") and os.path.exists("/proc/self/stat")
+
+    def read_file(self, path):
+        buf = getattr(self.local, "buf", None)
+        if buf is None:
+            buf = self.local.buf = bytearray(4096)
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            return buf, os.readv(fd, [buf])
+        finally:
+            os.close(fd)
+
+    def read_stat(self, pid):
+        """(comm, fields after the comm) of /proc/<pid>/stat; field 0 is the state, 1 the ppid"""
+        buf, size = self.read_file(f"{self.root}/{pid}/stat")
+        # comm may itself contain spaces and parentheses, so split on the last ')'
+        end = buf.rfind(b")", 0, size)
+        return buf[buf.find(b"(", 0, end) + 1:end], buf[end + 2:size].split()
+
+    def full_name(self, pid, comm):
+        """The kernel cuts comm at 15 characters; recover the full name from the command line like psutil does"""
+        try:
+            with open(f"{self.root}/{pid}/cmdline", "rb") as f:
+                argv0 = f.read().split(b"\0", 1)[0]
+        except OSError:
+            return comm
+        name = os.path.basename(argv0.decode("utf-8", "replace"))
+        return name if name.startswith(comm) else comm
+
+    def scan(self):
+        for entry in os.listdir(self.root):
+            if not entry.isdigit():
+                continue
+            pid = int(entry)
+            try:
+                comm, fields = self.read_stat(pid)
+            except OSError:
+                continue  # Exited mid-sweep
+            name = comm.decode("utf-8", "replace")
+            if len(comm) >= 15:
+                name = self.full_name(pid, name)
+            yield pid, int(fields[1]), name, None, int(fields[19])
+
+    def read(self, process):
+        pid = process.pid
+        try:
+            comm, fields = self.read_stat(pid)
+            # stat's own rss field leaves out part of the resident set; statm matches VmRSS and psutil
+            buf, size = self.read_file(f"{self.root}/{pid}/statm")
+            resident = int(buf[:size].split(None, 2)[1])
+        except (FileNotFoundError, ProcessLookupError):
+            raise psutil.NoSuchProcess(pid)
+        except PermissionError:
+            raise psutil.AccessDenied(pid)
+        status = self.STATUSES.get(chr(fields[0][0]), psutil.STATUS_SLEEPING)
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / self.ticks
+        return status, cpu_seconds, resident * self.page_size, int(fields[19])
+
+    def process(self, pid, start):
+        """psutil.Process for a swept pid, reused for as long as the pid keeps its start time"""
+        with self.lock:
+            cached = self.handles.get(pid)
+        if cached is not None and cached[0] == start:
+            return cached[1]
+        try:
+            p = psutil.Process(pid)
+        except psutil.Error:
+            return None
+        with self.lock:
+            self.handles[pid] = (start, p)
+        return p
+
+    def exe(self, pid, start):
+        with self.lock:
+            cached = self.exes.get(pid)
+        if cached is not None and cached[0] == start:
+            return cached[1]
+        try:
+            path = os.readlink(f"{self.root}/{pid}/exe")
+        except OSError:
+            path = None  # Exited, a kernel thread, or another user's process
+        if path and path.endswith(" (deleted)"):
+            path = path[:-10]
+        with self.lock:
+            self.exes[pid] = (start, path)
+        return path
+
+    def prune(self, live_pids):
+        with self.lock:
+            for cache in (self.handles, self.exes):
+                for pid in [pid for pid, (start, _) in cache.items() if live_pids.get(pid) != start]:
+                    del cache[pid]
+
+def sampler_backend(kind="auto"):
+    """The /proc fast path on Linux, psutil everywhere else (or when asked for)"""
+    if kind in ("auto", "procfs") and ProcfsBackend.available():
+        return ProcfsBackend()
+    if kind == "procfs":
+        logging.warning("procfs sampler is not available on this system; using psutil")
+    return PsutilBackend()
+
+class ProcessScanner:
+    """Walks the system process table once per tick and indexes it by name, exe and parent"""
+    def __init__(self, max_age=1.0, backend=None):
+        self.max_age = max_age
+        self.backend = backend or sampler_backend()
+        self.sweep_lock = threading.Lock()
+        self.by_name = {}
+        self.by_exe = {}
+        self.pids = {}
+        self.parents = {}
+        self.children = {}
+        self.last_sweep = 0.0
+        
+        # Per-sweep cost, shown in the status bar
+        self.sweeps = 0
+        self.last_ms = 0.0
+        self.total_ms = 0.0
+        self.proc_count = 0
+
+    def refresh(self, max_age=None):
+        """Sweep again only if the current index is older than max_age"""
+        max_age = self.max_age if max_age is None else max_age
+        with self.sweep_lock:
+            # Monitors waiting on the lock reuse the sweep that just finished
+            if time.monotonic() - self.last_sweep < max_age:
+                return
+            self.sweep()
+
+    def sweep(self):
+        start = time.perf_counter()
+        backend = self.backend
+        by_name, pids, parents = {}, {}, {}
+        by_exe = {} if backend.has_exe else None
+        for pid, ppid, name, exe, handle in backend.scan():
+            pids[pid] = handle
+            parents[pid] = ppid
+            if name:
+                by_name.setdefault(name.lower(), []).append(pid)
+            if exe:
+                by_exe.setdefault(os.path.normcase(exe), []).append(pid)
+        backend.prune(pids)
+        
+        # The children index is patched rather than rebuilt: only pids that appeared,
+        # exited or were re-parented since the last sweep touch it
+        old_parents, children = self.parents, self.children
+        for pid, ppid in old_parents.items():
+            if parents.get(pid) != ppid:
+                kids = children.get(ppid)
+                if kids is not None:
+                    kids.discard(pid)
+                    if not kids: del children[ppid]
+        for pid, ppid in parents.items():
+            if old_parents.get(pid) != ppid:
+                children.setdefault(ppid, set()).add(pid)
+        
+        # Swap in the new index in one step so readers never see a half-built table
+        self.by_name, self.by_exe, self.pids, self.parents = by_name, by_exe, pids, parents
+        self.last_sweep = time.monotonic()
+        
+        elapsed = (time.perf_counter() - start) * 1000
+        timings.observe("sweep", elapsed / 1000)
+        self.sweeps += 1
+        self.last_ms = elapsed
+        self.total_ms += elapsed
+        self.proc_count = len(pids)
+
+    def find(self, proc, exclude=()):
+        """O(1) lookup of a configured entry, matching the exe path first and the name second;
+        pids in exclude (e.g. claimed by other entries) are skipped"""
+        by_exe, by_name = self.by_exe, self.by_name
+        matches = None
+        if proc.get("path"):
+            path = os.path.normcase(os.path.abspath(proc["path"]))
+            if by_exe is not None:
+                matches = by_exe.get(path)
+            else:
+                # Without an exe index only processes named like the file get their exe link read
+                matches = [pid for pid in by_name.get(os.path.basename(path).lower(), ()) if self.exe(pid) == path]
+        matches = [pid for pid in matches or () if pid not in exclude]
+        if not matches:
+            matches = [pid for pid in by_name.get(proc["name"].lower(), ()) if pid not in exclude]
+        for pid in matches:
+            process = self.process(pid)
+            if process is not None:
+                return process
+        return None
+
+    def process(self, pid):
+        """psutil.Process for a pid of the last sweep, or None"""
+        handle = self.pids.get(pid)
+        return None if handle is None else self.backend.process(pid, handle)
+
+    def exe(self, pid):
+        handle = self.pids.get(pid)
+        return None if handle is None else self.backend.exe(pid, handle)
+
+    def descendants(self, pid):
+        """Every pid below pid in the last sweep, parents before their children"""
+        found, seen, queue = [], {pid}, collections.deque([pid])
+        while queue:
+            for child in tuple(self.children.get(queue.popleft(), ())):
+                # pid 0 is its own parent on some platforms
+                if child in seen: continue
+                seen.add(child)
+                found.append(child)
+                queue.append(child)
+        return found
+
+    def stats_text(self):
+        if not self.sweeps:
+            return ""
+        avg = self.total_ms / self.sweeps
+        return f"Sweep: {self.last_ms:.1f} ms (avg {avg:.1f} ms, {self.proc_count} procs, {self.backend.name})"
+
+class CpuSampler:
+    """Reads processes through the sampler backend and derives CPU% from deltas between ticks"""
+    def __init__(self, backend=None):
+        self.backend = backend or sampler_backend()
+        self.lock = threading.Lock()
+        self.cache = {}  # pid -> [identity, cpu_seconds, timestamp]
+
+    def sample(self, process):
+        """Returns (status, cpu_percent, rss_bytes) without blocking; raises psutil.Error if the PID is gone"""
+        pid = process.pid
+        try:
+            status, cpu_seconds, rss, identity = self.backend.read(process)
+        except psutil.Error:
+            self.forget(pid)
+            raise
+        
+        now = time.monotonic()
+        with self.lock:
+            entry = self.cache.get(pid)
+            # A reused PID shows up with a different identity (start time), so its old baseline is dropped
+            if entry is None or entry[0] != identity:
+                entry = self.cache[pid] = [identity, None, 0.0]
+            last_seconds, last_time = entry[1], entry[2]
+            entry[1], entry[2] = cpu_seconds, now
+        cpu = 0.0
+        if last_seconds is not None and now > last_time:
+            cpu = max(0.0, (cpu_seconds - last_seconds) / (now - last_time) * 100)
+        return status, cpu, rss
+
+    def forget(self, pid):
+        with self.lock:
+            self.cache.pop(pid, None)
+
+    def prune(self, live_pids):
+        """Drops cached processes that vanished from the latest sweep"""
+        with self.lock:
+            for pid in [pid for pid in self.cache if pid not in live_pids]:
+                del self.cache[pid]
+
+class MetricRing:
+    """Array-backed ring of averaged CPU/RAM buckets at one resolution"""
+    def __init__(self, step, size):
+        self.step = step
+        self.size = size
+        self.buckets = array('q', [-1]) * size  # Bucket number held by each slot, -1 when empty
+        self.cpu = array('f', [0.0]) * size
+        self.ram = array('f', [0.0]) * size
+        self.current = -1
+        self.cpu_sum = self.ram_sum = 0.0
+        self.count = 0
+
+    def add(self, t, cpu, ram):
+        bucket = int(t // self.step)
+        if bucket != self.current:
+            self.current = bucket
+            self.cpu_sum = self.ram_sum = 0.0
+            self.count = 0
+        self.cpu_sum += cpu
+        self.ram_sum += ram
+        self.count += 1
+        
+        # The open bucket holds the running average, so readers never wait for it to close
+        slot = bucket % self.size
+        self.buckets[slot] = bucket
+        self.cpu[slot] = self.cpu_sum / self.count
+        self.ram[slot] = self.ram_sum / self.count
+
+    def query(self, since, until):
+        """Returns [(time, cpu, ram)] for the buckets between two timestamps, oldest first"""
+        points = []
+        last = int(until // self.step)
+        first = max(int(since // self.step), last - self.size + 1)
+        for bucket in range(first, last + 1):
+            slot = bucket % self.size
+            if self.buckets[slot] == bucket:
+                points.append((bucket * self.step, self.cpu[slot], self.ram[slot]))
+        return points
+
+class MetricsHistory:
+    """Fixed-memory CPU/RAM history of one entry, downsampled to 1 s, 1 min and 1 h buckets"""
+    TIERS = ((1, 300), (60, 360), (3600, 336))  # (seconds per bucket, buckets): 5 min, 6 h, 14 days
+
+    def __init__(self):
+        self.rings = [MetricRing(step, size) for step, size in self.TIERS]
+
+    def add(self, cpu, ram, t=None):
+        t = time.time() if t is None else t
+        for ring in self.rings:
+            ring.add(t, cpu, ram)
+
+    def last(self, seconds, now=None):
+        """Points for the last N seconds from the finest resolution that still covers them"""
+        now = time.time() if now is None else now
+        for ring in self.rings:
+            if ring.step * ring.size >= seconds:
+                break
+        return ring.query(now - seconds, now)
+
+class RollingMean:
+    """Mean of the samples in a sliding time window, kept as a running sum (amortized O(1) per sample)"""
+    def __init__(self, window):
+        self.window = window
+        self.samples = collections.deque()
+        self.total = 0.0
+        self.since = None
+
+    def add(self, t, value):
+        if self.since is None: self.since = t
+        self.samples.append((t, value))
+        self.total += value
+        while self.samples[0][0] <= t - self.window:
+            self.total -= self.samples.popleft()[1]
+
+    def full(self, t):
+        """True once the samples cover a whole window, so one early spike cannot trip a limit"""
+        return self.since is not None and t - self.since >= self.window
+
+    def mean(self):
+        return self.total / len(self.samples) if self.samples else 0.0
+
+class TrendFit:
+    """Least-squares slope of value over time in a sliding window, from running sums (amortized O(1) per sample)"""
+    def __init__(self, window):
+        self.window = window
+        self.samples = collections.deque()
+        self.since = None
+        self.base = None
+        self.n = 0
+        self.sx = self.sy = self.sxx = self.sxy = self.syy = 0.0
+
+    def _sum(self, x, y, sign):
+        self.n += sign
+        self.sx += sign * x
+        self.sy += sign * y
+        self.sxx += sign * x * x
+        self.sxy += sign * x * y
+        self.syy += sign * y * y
+
+    def add(self, t, y):
+        if self.since is None: self.since = self.base = t
+        if t - self.base > 4 * self.window:
+            # Move the time origin now and then so the sums keep their precision over long uptimes
+            self.base = t
+            self.n = 0
+            self.sx = self.sy = self.sxx = self.sxy = self.syy = 0.0
+            for old_t, old_y in self.samples:
+                self._sum(old_t - t, old_y, 1)
+        self.samples.append((t, y))
+        self._sum(t - self.base, y, 1)
+        while self.samples[0][0] <= t - self.window:
+            old_t, old_y = self.samples.popleft()
+            self._sum(old_t - self.base, old_y, -1)
+
+    def full(self, t):
+        return self.since is not None and t - self.since >= self.window
+
+    def fit(self):
+        """(slope per second, r²), or None with too few samples to fit a line"""
+        n = self.n
+        if n < 3:
+            return None
+        var_x = self.sxx - self.sx * self.sx / n
+        if var_x <= 0:
+            return None
+        cov = self.sxy - self.sx * self.sy / n
+        var_y = self.syy - self.sy * self.sy / n
+        r2 = cov * cov / (var_x * var_y) if var_y > 0 else 0.0
+        return cov / var_x, r2
+
+class ResourceGuard:
+    """Per-entry RSS/CPU ceilings over rolling windows plus RSS leak detection from the fitted growth trend"""
+    KEYS = ('max_rss_mb', 'max_cpu_percent', 'leak_mb_per_hour')
+
+    def __init__(self, proc):
+        self.max_rss = proc.get("max_rss_mb")
+        self.max_cpu = proc.get("max_cpu_percent")
+        self.leak_rate = proc.get("leak_mb_per_hour")
+        self.leak_r2 = proc.get("leak_min_r2", 0.8)  # How straight the growth must be to count as a leak
+        self.rss = RollingMean(proc.get("rss_window", 60)) if self.max_rss else None
+        self.cpu = RollingMean(proc.get("cpu_window", 300)) if self.max_cpu else None
+        self.trend = TrendFit(proc.get("leak_window", 3600)) if self.leak_rate else None
+
+    @classmethod
+    def for_entry(cls, proc):
+        """A guard for entries that configure any limit, None (and no per-tick cost) for the rest"""
+        return cls(proc) if any(proc.get(key) for key in cls.KEYS) else None
+
+    def check(self, t, cpu, ram):
+        """Adds one sample (ram in MB); returns a description of the first violated limit or None"""
+        if self.rss: self.rss.add(t, ram)
+        if self.cpu: self.cpu.add(t, cpu)
+        if self.trend: self.trend.add(t, ram)
+        
+        if self.rss and self.rss.full(t) and self.rss.mean() > self.max_rss:
+            return f"RSS averaged {self.rss.mean():.0f} MB over {self.rss.window}s (limit {self.max_rss} MB)"
+        if self.cpu and self.cpu.full(t) and self.cpu.mean() > self.max_cpu:
+            return f"CPU averaged {self.cpu.mean():.0f}% over {self.cpu.window}s (limit {self.max_cpu}%)"
+        if self.trend and self.trend.full(t):
+            fit = self.trend.fit()
+            if fit and fit[0] * 3600 > self.leak_rate and fit[1] >= self.leak_r2:
+                return (f"RSS growing {fit[0] * 3600:.1f} MB/h over {self.trend.window}s "
+                        f"(r²={fit[1]:.2f}, limit {self.leak_rate} MB/h)")
+        return None
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+def sparkline(values, width=24):
+    """Renders values as a fixed-width unicode sparkline, averaging them into width columns"""
+    if not values:
+        return ""
+    if len(values) > width:
+        per = len(values) / width
+        values = [sum(values[int(i * per):int((i + 1) * per)]) / max(1, int((i + 1) * per) - int(i * per)) for i in range(width)]
+    top = max(values) or 1.0
+    return "".join(SPARK_CHARS[min(len(SPARK_CHARS) - 1, int(v / top * len(SPARK_CHARS)))] for v in values)
+
+class RestartPolicy:
+    """Per-entry crash-loop protection: sliding-window crash rate, jittered backoff and a circuit breaker"""
+    def __init__(self, proc):
+        self.max_restarts = proc.get("max_restarts", 5)  # Allowed crashes per window before quarantine
+        self.window = proc.get("restart_window", 60)
+        self.backoff_base = proc.get("backoff_base", 1.0)
+        self.backoff_max = proc.get("backoff_max", 300.0)
+        self.stable_after = proc.get("stable_after", 120)  # Uptime that clears the crash history
+        
+        self.crashes = collections.deque()
+        self.failures = 0  # Consecutive crashes since the last stable run
+        self.last_start = None
+        self.quarantined = False
+
+    def on_started(self, now):
+        self.last_start = now
+
+    def on_healthy(self, now):
+        if self.failures and self.last_start is not None and now - self.last_start >= self.stable_after:
+            self.failures = 0
+            self.crashes.clear()
+
+    def on_crash(self, now):
+        """Returns the delay before the next restart, or None once the circuit breaker trips"""
+        self.crashes.append(now)
+        while now - self.crashes[0] > self.window:
+            self.crashes.popleft()
+        if len(self.crashes) > self.max_restarts:
+            self.quarantined = True
+            return None
+        
+        self.failures += 1
+        if self.failures == 1:
+            return 0.0  # A one-off crash is restarted right away
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (self.failures - 2))
+        # Jitter keeps apps that crashed together from restarting in lockstep
+        return delay * random.uniform(0.5, 1.0)
+
+class ChildWatcher:
+    """Gets notified the moment a started child exits instead of waiting for the next poll"""
+    POLL_INTERVAL = 0.2
+
+    def __init__(self, on_exit):
+        self.on_exit = on_exit
+        self.lock = threading.Lock()
+        self.children = {}  # pid -> (popen, owner, pidfd)
+        self.wake = threading.Event()
+        
+        # Linux 5.3+: a pidfd becomes readable when the child exits, so one select() covers every child
+        self.selector = None
+        if hasattr(os, "pidfd_open"):
+            self.selector = selectors.DefaultSelector()
+            self.wake_r, self.wake_w = os.pipe()
+            self.selector.register(self.wake_r, selectors.EVENT_READ)
+        
+        threading.Thread(target=self.run, daemon=True, name="child-watcher").start()
+
+    def watch(self, popen, owner):
+        pidfd = None
+        if self.selector:
+            try:
+                pidfd = os.pidfd_open(popen.pid)
+            except OSError:
+                pidfd = None  # Old kernel or child already gone, fall back to polling
+        with self.lock:
+            self.children[popen.pid] = (popen, owner, pidfd)
+            if pidfd is not None:
+                self.selector.register(pidfd, selectors.EVENT_READ, popen.pid)
+        self.notify()
+
+    def notify(self):
+        if self.selector:
+            os.write(self.wake_w, b"\0")
+        else:
+            self.wake.set()
+
+    def run(self):
+        while True:
+            with self.lock:
+                polled = [pid for pid, (_, _, pidfd) in self.children.items() if pidfd is None]
+            timeout = self.POLL_INTERVAL if polled else None
+            
+            ready = []
+            if self.selector:
+                for key, _ in self.selector.select(timeout):
+                    if key.fd == self.wake_r:
+                        os.read(self.wake_r, 512)
+                    else:
+                        ready.append(key.data)
+            else:
+                self.wake.wait(timeout)
+                self.wake.clear()
+            
+            for pid in ready + polled:
+                self.reap(pid)
+
+    def reap(self, pid):
+        with self.lock:
+            entry = self.children.get(pid)
+            if entry is None:
+                return
+            popen, owner, pidfd = entry
+            # poll() reaps the child so no zombie is left behind
+            if popen.poll() is None:
+                return
+            del self.children[pid]
+            if pidfd is not None:
+                self.selector.unregister(pidfd)
+                os.close(pidfd)
+        try:
+            self.on_exit(owner, popen)
+        except Exception as e:
+            logging.error(f"Child exit handler error: {str(e)}")
+
+class MonitorScheduler:
+    """Drives every entry's checks from one heap-ordered loop plus a small bounded worker pool"""
+    DEFAULT_DELAY = 5.0  # Used when a check fails or returns something that is not a delay
+
+    def __init__(self, check, prepare=None, max_workers=4):
+        self.check = check  # check(proc) -> seconds until the next check
+        self.prepare = prepare  # prepare(batch, fresh) runs once per batch of due entries
+        self.cond = threading.Condition()
+        self.heap = []  # (due, seq, key); stale items are skipped lazily
+        self.seq = itertools.count()
+        self.entries = {}  # key -> proc
+        self.due = {}  # key -> due time of the live heap item
+        self.in_flight = set()
+        self.woken = set()
+        
+        # Check-loop timings for the metrics endpoint
+        self.checks = 0
+        self.check_seconds = 0.0
+        self.lag_seconds = 0.0
+        self.budget = None  # Max checks per second across all entries; None for no cap
+        self.next_slot = 0.0  # Budgeted first checks of newly added entries are spaced out from here
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="guardian-check")
+        threading.Thread(target=self.run, daemon=True, name="monitor-scheduler").start()
+
+    def add(self, proc, delay=0.0):
+        with self.cond:
+            key = id(proc)
+            self.entries[key] = proc
+            if key in self.in_flight:
+                # Re-added (e.g. Stop then Start) mid-check: the running check reschedules it on
+                # completion, so pushing here too would run two checks of one entry at once
+                self.woken.add(key)
+                return
+            due = time.monotonic() + delay
+            if self.budget:
+                # A burst of new entries gets its first checks spread out instead of all at once
+                self.next_slot = max(self.next_slot + 1.0 / self.budget, due)
+                due = self.next_slot
+            self._push(key, due)
+
+    def remove(self, proc):
+        with self.cond:
+            key = id(proc)
+            self.entries.pop(key, None)
+            self.due.pop(key, None)
+            self.woken.discard(key)
+
+    def wake(self, proc):
+        """Run the entry's next check right away, e.g. after its child exited"""
+        with self.cond:
+            key = id(proc)
+            if key not in self.entries:
+                return
+            self.woken.add(key)
+            # A check already in flight picks the wake-up when it finishes
+            if key not in self.in_flight:
+                self._push(key, time.monotonic())
+
+    def _push(self, key, due):
+        self.due[key] = due
+        heapq.heappush(self.heap, (due, next(self.seq), key))
+        self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while True:
+                    while self.heap and self.due.get(self.heap[0][2]) != self.heap[0][0]:
+                        heapq.heappop(self.heap)
+                    now = time.monotonic()
+                    if self.heap and self.heap[0][0] <= now:
+                        break
+                    self.cond.wait(self.heap[0][0] - now if self.heap else None)
+                
+                batch, dues, fresh = [], [], False
+                while self.heap and self.heap[0][0] <= now:
+                    due, _, key = heapq.heappop(self.heap)
+                    if self.due.get(key) != due:
+                        continue
+                    del self.due[key]
+                    self.in_flight.add(key)
+                    if key in self.woken:
+                        self.woken.discard(key)
+                        fresh = True
+                    batch.append(self.entries[key])
+                    dues.append(due)
+            
+            if self.prepare:
+                try:
+                    self.prepare(batch, fresh)
+                except Exception as e:
+                    logging.error(f"Scheduler Error: {str(e)}")
+            for proc, due in zip(batch, dues):
+                self.pool.submit(self.run_check, proc, due)
+
+    def run_check(self, proc, due=None):
+        delay = self.DEFAULT_DELAY
+        start = time.monotonic()
+        try:
+            delay = self.check(proc)
+        except Exception as e:
+            logging.error(f"Scheduler Error: {str(e)}")
+        finally:
+            # A bad interval in the config must never drop the entry out of the heap
+            try:
+                delay = float(delay)
+                if not 0 <= delay < float("inf"): raise ValueError(delay)
+            except (TypeError, ValueError):
+                logging.error(f"Scheduler Error: invalid check delay {delay!r} for {proc.get('name')}, using {self.DEFAULT_DELAY:g} s")
+                delay = self.DEFAULT_DELAY
+            elapsed = time.monotonic() - start
+            timings.observe("check", elapsed)
+            with self.cond:
+                self.checks += 1
+                self.check_seconds += elapsed
+                if due is not None: self.lag_seconds += start - due
+                key = id(proc)
+                self.in_flight.discard(key)
+                if key in self.entries:
+                    if key in self.woken:
+                        delay = 0  # Events are never held back by the budget
+                    elif self.budget:
+                        # With every entry at least this far apart the whole fleet stays within budget
+                        delay = max(delay, len(self.entries) / self.budget)
+                    self._push(key, time.monotonic() + delay)
+
+class AsyncRuntime:
+    """One asyncio loop on a background thread, shared by the guardian's async services"""
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True, name="guardian-async").start()
+
+    def call(self, fn, *args):
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+class OutputSink:
+    """One entry's captured output: the child appends to a capped file, the guardian tails its end"""
+    def __init__(self, path, tail_bytes, max_bytes, backups):
+        self.path = path
+        self.lock = threading.Lock()
+        self.tail = bytearray()
+        self.tail_bytes = tail_bytes
+        self.max_bytes = max_bytes
+        self.backups = backups
+        # Start tailing near the end, so output from before a guardian restart is still shown
+        self.offset = max(0, os.path.getsize(path) - tail_bytes) if os.path.exists(path) else 0
+
+    def open_for_child(self, header):
+        """Rotates an oversized file and returns a fresh append handle to hand to the child as stdout"""
+        with self.lock:
+            self.read_new()
+            if self.offset > self.max_bytes:
+                self.rotate()
+            f = open(self.path, 'ab')
+            f.write(header)
+            f.flush()
+            return f
+
+    def poll(self):
+        with self.lock:
+            self.read_new()
+            # A running child keeps its handle, so the file is copied aside and truncated in place;
+            # O_APPEND puts the child's next write at the new end. Windows handles are not opened
+            # for append, so there the file only rotates when the child is restarted
+            if os.name == "posix" and self.offset > self.max_bytes:
+                self.rotate(copy=True)
+
+    def read_new(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size < self.offset: self.offset = 0  # Truncated behind our back
+        if size == self.offset: return
+        start = max(self.offset, size - self.tail_bytes)
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            data = f.read(size - start)
+        self.offset = start + len(data)
+        self.tail += data
+        if len(self.tail) > self.tail_bytes:
+            del self.tail[:len(self.tail) - self.tail_bytes]
+
+    def rotate(self, copy=False):
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups and copy:
+            # Only the newest max_bytes are kept, so a burst never makes the copy (or the backup) unbounded
+            with open(self.path, 'rb') as src, open(f"{self.path}.1", 'wb') as dst:
+                src.seek(max(0, os.fstat(src.fileno()).st_size - self.max_bytes))
+                dst.write(src.read(self.max_bytes))
+        elif self.backups: os.replace(self.path, f"{self.path}.1")
+        if copy or not self.backups: os.truncate(self.path, 0)
+        self.offset = 0
+
+    def text(self):
+        return bytes(self.tail).decode('utf-8', 'replace')
+
+class OutputCapture:
+    """Captures children's stdout/stderr into per-entry files and tails them from the shared event loop.
+
+    Children write straight to their file, so a chatty child never waits on the guardian and
+    keeps running if the guardian exits. One timer on the loop reads what was appended to
+    every file into that entry's in-memory tail, so hundreds of children add no threads.
+    """
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, runtime, folder, settings):
+        self.runtime = runtime
+        self.loop = runtime.loop
+        self.folder = folder
+        self.tail_bytes = int(settings.get("output_tail_kb", 64) * 1024)
+        self.max_bytes = int(settings.get("output_max_mb", 1) * 1024 * 1024)
+        self.backups = settings.get("output_backups", 3)
+        self.lock = threading.Lock()
+        self.sinks = {}  # entry id -> OutputSink
+        self.followed = set()
+        self.poll_handle = None
+
+    def sink(self, proc):
+        with self.lock:
+            sink = self.sinks.get(proc["id"])
+            if sink is None:
+                os.makedirs(self.folder, exist_ok=True)
+                path = os.path.join(self.folder, f"{proc['id']}.log")
+                sink = self.sinks[proc["id"]] = OutputSink(path, self.tail_bytes, self.max_bytes, self.backups)
+            return sink
+
+    def child_stdout(self, proc):
+        """The file handle to start a captured child with, or None to let it inherit the guardian's"""
+        try:
+            sink = self.sink(proc)
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S')
+            f = sink.open_for_child(f"--- {stamp} starting {proc['name']} ---\n".encode("utf-8"))
+        except OSError as e:
+            logging.error(f"Output capture for {proc['name']} failed: {str(e)}")
+            return None
+        self.runtime.call(self.follow, sink)
+        return f
+
+    def follow(self, sink):
+        self.followed.add(sink)
+        if self.poll_handle is None:
+            self.poll_handle = self.loop.call_later(self.POLL_INTERVAL, self.poll_all)
+
+    def poll_all(self):
+        self.poll_handle = None
+        for sink in self.followed:
+            try:
+                sink.poll()
+            except OSError as e:
+                logging.error(f"Error reading captured output {sink.path}: {str(e)}")
+        if self.followed:
+            self.poll_handle = self.loop.call_later(self.POLL_INTERVAL, self.poll_all)
+
+    def after_exit(self, proc, callback):
+        """Calls callback(tail bytes) on the loop with everything the exited child wrote"""
+        def read():
+            sink = self.sinks.get(proc["id"])
+            if sink is None: return
+            try:
+                sink.poll()
+            except OSError as e:
+                logging.error(f"Error reading captured output {sink.path}: {str(e)}")
+            callback(bytes(sink.tail))
+        self.runtime.call(read)
+
+    def text(self, proc):
+        sink = self.sinks.get(proc["id"])
+        return sink.text() if sink is not None else ""
+
+    def release(self, proc):
+        """Forgets a removed entry's sink and stops tailing its file; the file itself is kept"""
+        with self.lock:
+            sink = self.sinks.pop(proc.get("id"), None)
+        if sink is not None:
+            self.runtime.call(self.followed.discard, sink)
+
+def parse_probe(text):
+    """Turns the Add dialog's probe field into a probe config: tcp://host:port, http(s)://url or a command"""
+    text = text.strip()
+    if not text:
+        return None
+    if text.startswith("tcp://"):
+        url = urllib.parse.urlsplit(text)
+        try:
+            port = url.port
+        except ValueError:
+            port = url.netloc.rpartition(":")[2]  # Kept as typed, for probe_problem to report
+        return {"type": "tcp", "host": url.hostname or "127.0.0.1", "port": port}
+    if text.startswith(("http://", "https://")):
+        return {"type": "http", "url": text}
+    return {"type": "command", "command": text}
+
+def probe_problem(probe):
+    """Returns why a probe config cannot be used, or None when it is fine"""
+    if not isinstance(probe, dict) or probe.get("type") not in ("tcp", "http", "command"):
+        return "probe must be tcp://host:port, an http(s):// URL or a command"
+    if probe["type"] == "tcp":
+        port = probe.get("port")
+        if port is None or port == "":
+            return "TCP probe needs a port, e.g. tcp://127.0.0.1:8080"
+        if not isinstance(port, int) or isinstance(port, bool) or not 0 < port < 65536:
+            return f"invalid TCP probe port {port!r}"
+    if probe["type"] == "http":
+        if not isinstance(probe.get("url"), str) or not probe["url"].startswith(("http://", "https://")):
+            return "HTTP probe needs an http(s):// url"
+        try:
+            url = urllib.parse.urlsplit(probe["url"])
+            url.port
+        except ValueError as e:
+            return f"invalid probe URL: {e}"
+        if not url.hostname:
+            return "HTTP probe URL needs a host"
+    if probe["type"] == "command":
+        if not isinstance(probe.get("command"), str):
+            return "command probe needs a command"
+        try:
+            if not shlex.split(probe["command"]): return "command probe needs a command"
+        except ValueError as e:
+            return f"invalid probe command: {e}"
+    return None
+
+class ProbeState:
+    def __init__(self, probe):
+        self.probe = probe
+        self.failures = 0
+        self.not_before = 0.0
+        self.conn = None  # Kept-alive (reader, writer) for HTTP probes
+        self.task = None
+
+class ProbeError(Exception):
+    pass
+
+class ProbeEngine:
+    """Runs TCP, HTTP and command health probes for every entry concurrently on one asyncio loop"""
+    MAX_CONCURRENT = 256  # Probes in flight at once, so a large fleet cannot exhaust sockets
+    DEFAULT_GRACE = 10.0  # Seconds after a (re)start before failures count
+
+    def __init__(self, runtime, on_failed, on_failing=None):
+        self.runtime = runtime
+        self.on_failed = on_failed  # on_failed(proc, reason), called on the loop thread
+        self.on_failing = on_failing  # on_failing(proc), called on the first failure of a run
+        self.states = {}  # id(proc) -> ProbeState, only touched on the loop thread
+        self.limit = None
+
+    def start(self, proc):
+        self.runtime.call(self._start, proc)
+
+    def failing(self, proc):
+        """True while the entry's probe has failed at least once since its last success"""
+        state = self.states.get(id(proc))
+        return state is not None and state.failures > 0
+
+    async def probe_once(self, probe):
+        """A single probe outside any entry's schedule, e.g. a startup readiness check"""
+        state = ProbeState(probe)
+        try:
+            return await self.check(state)
+        finally:
+            self.close_conn(state)
+
+    def stop(self, proc):
+        self.runtime.call(self._stop, proc)
+
+    def reset(self, proc):
+        """Called after the entry was (re)started: clears failures and waits out the grace period"""
+        self.runtime.call(self._reset, proc)
+
+    def _start(self, proc):
+        self._stop(proc)
+        state = ProbeState(proc["probe"])
+        state.not_before = self.runtime.loop.time() + state.probe.get("grace", self.DEFAULT_GRACE)
+        state.task = self.runtime.loop.create_task(self.run(proc, state))
+        self.states[id(proc)] = state
+
+    def _stop(self, proc):
+        state = self.states.pop(id(proc), None)
+        if state:
+            state.task.cancel()
+            self.close_conn(state)
+
+    def _reset(self, proc):
+        state = self.states.get(id(proc))
+        if state:
+            state.failures = 0
+            state.not_before = self.runtime.loop.time() + state.probe.get("grace", self.DEFAULT_GRACE)
+
+    async def run(self, proc, state):
+        loop = self.runtime.loop
+        probe = state.probe
+        while True:
+            await asyncio.sleep(max(probe.get("interval", 5), state.not_before - loop.time()))
+            if loop.time() < state.not_before:
+                continue
+            ok, reason = await self.check(state)
+            if ok:
+                state.failures = 0
+                continue
+            state.failures += 1
+            if state.failures == 1 and self.on_failing:
+                try:
+                    self.on_failing(proc)
+                except Exception as e:
+                    logging.error(f"Probe handler error: {str(e)}")
+            # Only a run of consecutive failures counts as "not responding"
+            if state.failures >= probe.get("failures", 3):
+                state.failures = 0
+                state.not_before = loop.time() + probe.get("grace", self.DEFAULT_GRACE)
+                try:
+                    self.on_failed(proc, reason)
+                except Exception as e:
+                    logging.error(f"Probe handler error: {str(e)}")
+
+    async def check(self, state):
+        if self.limit is None:
+            self.limit = asyncio.Semaphore(self.MAX_CONCURRENT)
+        kind = state.probe.get("type", "tcp")
+        probe_fn = {"tcp": self.probe_tcp, "http": self.probe_http, "command": self.probe_command}.get(kind)
+        if probe_fn is None:
+            return False, f"unknown probe type '{kind}'"
+        async with self.limit:
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(probe_fn(state), state.probe.get("timeout", 2.0))
+                timings.observe("probe", time.perf_counter() - start)
+                return True, ""
+            except asyncio.TimeoutError:
+                self.close_conn(state)
+                return False, f"{kind} probe timed out"
+            except Exception as e:
+                self.close_conn(state)
+                return False, f"{kind} probe failed: {e}"
+
+    async def probe_tcp(self, state):
+        reader, writer = await asyncio.open_connection(state.probe.get("host", "127.0.0.1"), state.probe["port"])
+        writer.close()
+
+    async def probe_http(self, state):
+        url = urllib.parse.urlsplit(state.probe["url"])
+        secure = url.scheme == "https"
+        path = (url.path or "/") + (f"?{url.query}" if url.query else "")
+        request = (f"GET {path} HTTP/1.1\r\nHost: {url.netloc}\r\n"
+                   f"User-Agent: ProcessGuardian\r\nConnection: keep-alive\r\n\r\n").encode()
+        
+        for attempt in range(2):
+            fresh = state.conn is None
+            if fresh:
+                state.conn = await asyncio.open_connection(url.hostname, url.port or (443 if secure else 80),
+                                                           ssl=ssl.create_default_context() if secure else None)
+            reader, writer = state.conn
+            try:
+                writer.write(request)
+                await writer.drain()
+                status_line = await reader.readline()
+                if not status_line:
+                    raise ConnectionError("connection closed")
+                status = int(status_line.split()[1])
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode('latin-1').partition(":")
+                    headers[key.strip().lower()] = value.strip().lower()
+                
+                # Drain the body so the connection can be reused for the next probe
+                if "content-length" in headers:
+                    await reader.readexactly(int(headers["content-length"]))
+                elif headers.get("transfer-encoding") == "chunked":
+                    while True:
+                        size = int((await reader.readline()).split(b";")[0], 16)
+                        await reader.readexactly(size + 2)
+                        if size == 0:
+                            break
+                else:
+                    self.close_conn(state)
+                if headers.get("connection") == "close":
+                    self.close_conn(state)
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+                self.close_conn(state)
+                # An idle keep-alive connection may have been dropped by the server; retry once fresh
+                if fresh or attempt:
+                    raise
+                continue
+            if status >= 400:
+                raise ProbeError(f"HTTP {status}")
+            return
+
+    async def probe_command(self, state):
+        process = await asyncio.create_subprocess_exec(*shlex.split(state.probe["command"]),
+                                                       stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+        try:
+            code = await process.wait()
+        finally:
+            if process.returncode is None:
+                process.kill()
+        if code != 0:
+            raise ProbeError(f"exit code {code}")
+
+    def close_conn(self, state):
+        if state.conn is not None:
+            state.conn[1].close()
+            state.conn = None
+
+# The umask can only be read by setting it, and it is process-wide: read it once at import,
+# before any worker thread creates files
+UMASK = os.umask(0o077)
+os.umask(UMASK)
+
+def write_atomic(path, text):
+    """Writes to a temp file next to path and renames it over, so a crash never leaves a torn file"""
+    path = os.path.realpath(path)  # A symlinked config keeps its link; the file it points to is replaced
+    folder = os.path.dirname(path)
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~UMASK
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=folder)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600 files; keep the permissions the target had (or would get from open())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError: pass
+        raise
+
+class RestartJournal:
+    """Append-only log of volatile per-entry counters, kept out of the config file"""
+    COMPACT_MIN = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.lines = 0
+        self.load()
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.split()
+                    # A torn last line from a crash mid-append is simply ignored
+                    if len(parts) == 2 and parts[1].isdigit():
+                        self.counts[parts[0]] = int(parts[1])
+                        self.lines += 1
+        except Exception as e:
+            logging.error(f"Error loading restart journal: {str(e)}")
+
+    def get(self, entry_id, default=0):
+        return self.counts.get(entry_id, default)
+
+    def record(self, entry_id, count):
+        with self.lock:
+            self.counts[entry_id] = count
+            self.file.write(f"{entry_id} {count}\n")
+            self.file.flush()
+            self.lines += 1
+            if self.lines > max(self.COMPACT_MIN, 4 * len(self.counts)):
+                self.compact()
+
+    def compact(self, live_ids=None):
+        """Rewrites the journal as one line per entry; called with the lock held"""
+        if live_ids is not None:
+            self.counts = {k: v for k, v in self.counts.items() if k in live_ids}
+        self.file.close()
+        write_atomic(self.path, "".join(f"{k} {v}\n" for k, v in self.counts.items()))
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.lines = len(self.counts)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+class EventStore:
+    """Append-only crash/restart history in fixed-size binary records, split into numbered segments.
+
+    Segments load with one iter_unpack each, and a torn tail from a crash is cut at the last
+    whole record. The per-entry index is rebuilt from them on start and keeps every event's
+    time and position, plus the times of each kind, so counts over a range are two bisects.
+    Retention drops whole segments once everything in them has expired. Crash output is kept
+    in a sidecar per segment and looked up by the event's entry and time.
+    """
+    RECORD = struct.Struct("<dIBxxxiif")  # time, entry key, kind, pid, exit code, latency
+    ATTACHMENT = struct.Struct("<dII")  # time, entry key, length of the bytes that follow
+    KINDS = ("start", "restart", "crash", "quarantine", "limit", "unresponsive", "start_failed")
+    FAILURES = ("crash", "limit")  # A failed probe ends in a crash event once the tree is killed
+    NO_CODE = -2 ** 31
+    SEGMENT_BYTES = 1 << 20
+    SEGMENT_SECONDS = 86400
+
+    def __init__(self, folder, retention_days=30, readonly=False):
+        self.folder = folder
+        self.retention = retention_days * 86400 if retention_days else None
+        self.readonly = readonly
+        self.lock = threading.Lock()
+        self.keys = {}  # entry id -> small integer stored in each record
+        self.ids = []
+        self.names = []  # Name each entry had when first recorded, for entries since removed
+        self.segments = []  # [seq, first event time or None, size] in time order
+        self.times = {}  # key -> array('d') of event times
+        self.positions = {}  # key -> array('Q') of seq << 32 | offset
+        self.by_kind = {}  # (key, kind index) -> array('d') of event times
+        self.attachments = {}  # (key, event time) -> (seq, offset, length)
+        self.last_ts = 0.0
+        self.file = None
+        self.keys_file = None
+        if not readonly: os.makedirs(folder, exist_ok=True)
+        self.load()
+        if not readonly:
+            self.keys_file = open(os.path.join(folder, "keys.txt"), 'a', encoding='utf-8')
+            if self.segments:
+                self.file = open(self.segment_path(self.segments[-1][0]), 'ab')
+            if self.retention: self.expire(time.time())
+
+    def segment_path(self, seq):
+        return os.path.join(self.folder, f"{seq:08d}.seg")
+
+    def attachment_path(self, seq):
+        return os.path.join(self.folder, f"{seq:08d}.att")
+
+    def load(self):
+        if not os.path.isdir(self.folder):
+            return
+        try:
+            with open(os.path.join(self.folder, "keys.txt"), 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) == 3 and parts[0] == str(len(self.ids)):
+                        self.keys[parts[1]] = len(self.ids)
+                        self.ids.append(parts[1])
+                        self.names.append(parts[2])
+        except FileNotFoundError:
+            pass
+
+        size = self.RECORD.size
+        for name in sorted(os.listdir(self.folder)):
+            if not name.endswith(".seg") or not name[:-4].isdigit():
+                continue
+            seq = int(name[:-4])
+            path = self.segment_path(seq)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError as e:
+                logging.error(f"Error loading event segment {name}: {str(e)}")
+                continue
+            whole = len(data) - len(data) % size
+            if whole != len(data) and not self.readonly:
+                os.truncate(path, whole)
+            first = None
+            for i, record in enumerate(self.RECORD.iter_unpack(memoryview(data)[:whole])):
+                if first is None: first = record[0]
+                self.index(seq << 32 | i * size, record)
+            self.segments.append([seq, first, whole])
+            self.load_attachments(seq)
+
+    def load_attachments(self, seq):
+        """Indexes a segment's sidecar by walking its headers; the payloads are only read on request"""
+        try:
+            with open(self.attachment_path(seq), 'rb') as f:
+                end = os.fstat(f.fileno()).st_size
+                offset = 0
+                while offset + self.ATTACHMENT.size <= end:
+                    f.seek(offset)
+                    ts, key, length = self.ATTACHMENT.unpack(f.read(self.ATTACHMENT.size))
+                    if offset + self.ATTACHMENT.size + length > end: break  # Torn last write
+                    self.attachments[(key, ts)] = (seq, offset + self.ATTACHMENT.size, length)
+                    offset += self.ATTACHMENT.size + length
+        except FileNotFoundError:
+            pass
+
+    def index(self, position, record):
+        ts, key, kind = record[0], record[1], record[2]
+        times = self.times.get(key)
+        if times is None:
+            times = self.times[key] = array('d')
+            self.positions[key] = array('Q')
+        times.append(ts)
+        self.positions[key].append(position)
+        by_kind = self.by_kind.get((key, kind))
+        if by_kind is None: by_kind = self.by_kind[(key, kind)] = array('d')
+        by_kind.append(ts)
+        self.last_ts = max(self.last_ts, ts)
+
+    def append(self, entry_id, name, kind, pid=0, code=None, latency=None):
+        with self.lock:
+            key = self.keys.get(entry_id)
+            if key is None:
+                key = self.keys[entry_id] = len(self.ids)
+                self.ids.append(entry_id)
+                self.names.append(name)
+                self.keys_file.write(f"{key}\t{entry_id}\t{name}\n")
+                self.keys_file.flush()
+            # Wall clock so history spans guardian restarts; clamped so the index stays sorted
+            ts = max(time.time(), self.last_ts)
+            last = self.segments[-1] if self.segments else None
+            if last is None or last[2] >= self.SEGMENT_BYTES or (last[1] is not None and ts - last[1] >= self.SEGMENT_SECONDS):
+                last = self.roll()
+            record = (ts, key, self.KINDS.index(kind), pid or 0, self.NO_CODE if code is None else code,
+                      float("nan") if latency is None else latency)
+            self.file.write(self.RECORD.pack(*record))
+            self.file.flush()
+            if last[1] is None: last[1] = ts
+            self.index(last[0] << 32 | last[2], record)
+            last[2] += self.RECORD.size
+            return ts
+
+    def attach(self, entry_id, ts, data):
+        """Saves data (e.g. a crash's captured output) with the event recorded at ts"""
+        with self.lock:
+            key = self.keys.get(entry_id)
+            if key is None or not self.segments: return
+            seq = self.segments[-1][0]
+            with open(self.attachment_path(seq), 'ab') as f:
+                offset = f.tell()
+                f.write(self.ATTACHMENT.pack(ts, key, len(data)) + data)
+            self.attachments[(key, ts)] = (seq, offset + self.ATTACHMENT.size, len(data))
+
+    def attachment(self, entry_id, ts=None):
+        """The data attached to an entry's event at ts, or to its latest event that has some"""
+        with self.lock:
+            key = self.keys.get(entry_id)
+            if ts is None:
+                ts = max((t for k, t in self.attachments if k == key), default=None)
+            where = self.attachments.get((key, ts))
+            if where is None: return None
+            seq, offset, length = where
+            with open(self.attachment_path(seq), 'rb') as f:
+                f.seek(offset)
+                return f.read(length)
+
+    def roll(self):
+        """Starts a new segment and drops expired ones; called with the lock held"""
+        if self.file is not None: self.file.close()
+        seq = self.segments[-1][0] + 1 if self.segments else 0
+        self.file = open(self.segment_path(seq), 'ab')
+        self.segments.append([seq, None, 0])
+        if self.retention: self.expire(time.time())
+        return self.segments[-1]
+
+    def expire(self, now):
+        """Deletes segments whose events are all older than the retention window"""
+        cutoff = now - self.retention
+        dropped = 0
+        # A segment ends where the next one starts, so it has expired once its successor started before the cutoff
+        while len(self.segments) > 1 and self.segments[1][1] is not None and self.segments[1][1] <= cutoff:
+            seq = self.segments.pop(0)[0]
+            for path in (self.segment_path(seq), self.attachment_path(seq)):
+                try:
+                    os.remove(path)
+                except OSError: pass
+            dropped += 1
+        if not dropped:
+            return
+        keep_from = self.segments[0][0] << 32
+        self.attachments = {k: v for k, v in self.attachments.items() if v[0] >= self.segments[0][0]}
+        keep_after = self.segments[0][1] or now
+        for key, positions in list(self.positions.items()):
+            n = bisect.bisect_left(positions, keep_from)
+            if n == len(positions):
+                del self.positions[key], self.times[key]
+            elif n:
+                del positions[:n]
+                del self.times[key][:n]
+        for kind_key, times in list(self.by_kind.items()):
+            n = bisect.bisect_left(times, keep_after)
+            if n == len(times): del self.by_kind[kind_key]
+            elif n: del times[:n]
+        logging.info(f"Event history: dropped {dropped} expired segment(s)")
+
+    def count(self, key, kind, since, until):
+        times = self.by_kind.get((key, self.KINDS.index(kind)))
+        if not times: return 0
+        return bisect.bisect_right(times, until) - bisect.bisect_left(times, since)
+
+    def entry_stats(self, entry_id, since, until, name=None):
+        """Counts, restarts per hour and MTBF for one entry, over the part of the window it was recorded"""
+        key = self.keys.get(entry_id)
+        stats = {"id": entry_id, "name": name or (self.names[key] if key is not None else entry_id)}
+        counts = {kind: self.count(key, kind, since, until) if key is not None else 0 for kind in self.KINDS}
+        stats.update(counts)
+        times = self.times.get(key)
+        span = until - max(since, times[0]) if times else 0.0
+        failures = sum(counts[kind] for kind in self.FAILURES)
+        stats["failures"] = failures
+        stats["restarts_per_hour"] = counts["restart"] / (span / 3600) if span > 0 else 0.0
+        stats["mtbf_seconds"] = span / failures if failures else None
+        return stats
+
+    def report(self, since, until, names=None, entry_id=None, recent=20):
+        """Per-entry stats, worst first, plus the most recent events in the window"""
+        names = names or {}
+        with self.lock:
+            ids = [entry_id] if entry_id else list(dict.fromkeys(list(names) + self.ids))
+            entries = [self.entry_stats(i, since, until, names.get(i)) for i in ids]
+            events = self.events(entry_id, since, until, recent)
+        for event in events:
+            event["name"] = names.get(event["id"], event["name"])
+        entries.sort(key=lambda s: (-s["failures"], -s["restart"], s["name"]))
+        return {"since": since, "until": until, "entries": entries, "events": events}
+
+    def events(self, entry_id, since, until, limit):
+        """The newest events in [since, until], newest first; called with the lock held"""
+        size = self.RECORD.size
+        if entry_id is not None:
+            key = self.keys.get(entry_id)
+            if key is None or key not in self.times: return []
+            times = self.times[key]
+            lo, hi = bisect.bisect_left(times, since), bisect.bisect_right(times, until)
+            positions = self.positions[key][max(lo, hi - limit):hi]
+            records = []
+            for seq, group in itertools.groupby(positions, lambda p: p >> 32):
+                with open(self.segment_path(seq), 'rb') as f:
+                    for position in group:
+                        f.seek(position & 0xFFFFFFFF)
+                        records.append(self.RECORD.unpack(f.read(size)))
+            records.reverse()
+        else:
+            records = []
+            for seq, first, length in reversed(self.segments):
+                if first is None or first > until: continue
+                with open(self.segment_path(seq), 'rb') as f:
+                    data = f.read(length)
+                matching = [r for r in self.RECORD.iter_unpack(data) if since <= r[0] <= until]
+                records.extend(reversed(matching))
+                if len(records) >= limit or first < since: break
+            records = records[:limit]
+        return [self.describe(record) for record in records]
+
+    def describe(self, record):
+        ts, key, kind, pid, code, latency = record
+        entry_id = self.ids[key] if key < len(self.ids) else f"#{key}"
+        return {"time": ts, "id": entry_id, "name": self.names[key] if key < len(self.ids) else entry_id,
+                "kind": self.KINDS[kind] if kind < len(self.KINDS) else str(kind),
+                "pid": pid or None, "code": None if code == self.NO_CODE else code,
+                "latency": None if latency != latency else round(latency, 4),
+                "output": (key, ts) in self.attachments}
+
+    def close(self):
+        with self.lock:
+            if self.file is not None: self.file.close()
+            if self.keys_file is not None: self.keys_file.close()
+
+def history_text(report):
+    """Plain-text rendering of EventStore.report() for the GUI and the command line"""
+    hours = (report["until"] - report["since"]) / 3600
+    window = f"{hours / 24:.0f} days" if hours >= 48 else f"{hours:.0f} hours"
+    lines = [f"Last {window}", "",
+             f"{'Entry':<24} {'Failures':>8} {'Restarts':>8} {'Restarts/h':>10} {'MTBF':>10} {'Quarantined':>11}"]
+    for stats in report["entries"]:
+        mtbf = stats["mtbf_seconds"]
+        if mtbf is None: mtbf = "-"
+        elif mtbf >= 3600: mtbf = f"{mtbf / 3600:.1f} h"
+        else: mtbf = f"{mtbf / 60:.1f} min" if mtbf >= 60 else f"{mtbf:.0f} s"
+        lines.append(f"{stats['name'][:24]:<24} {stats['failures']:>8} {stats['restart']:>8} "
+                     f"{stats['restarts_per_hour']:>10.2f} {mtbf:>10} {stats['quarantine']:>11}")
+    lines += ["", "Recent events:"]
+    for event in report["events"]:
+        detail = []
+        if event["pid"]: detail.append(f"pid {event['pid']}")
+        if event["code"] is not None: detail.append(f"exit code {event['code']}")
+        if event["latency"] is not None: detail.append(f"{event['latency'] * 1000:.0f} ms")
+        if event.get("output"): detail.append("output saved")
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(event["time"]))
+        lines.append(f"{stamp}  {event['name'][:24]:<24} {event['kind']:<13} {', '.join(detail)}")
+    if not report["events"]:
+        lines.append("(none)")
+    return "\n".join(lines)
+
+class MetricsExporter:
+    """Serves the engine's metrics snapshot in OpenMetrics text format on a local port"""
+    CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+    def __init__(self, render, port, host="127.0.0.1"):
+        exporter = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = render()
+                self.send_response(200)
+                self.send_header("Content-Type", exporter.CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes would flood the event log
+        
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True, name="metrics-exporter").start()
+        logging.info(f"Metrics endpoint listening on http://{host}:{self.server.server_port}/metrics")
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class ControlError(Exception):
+    pass
+
+def control_address(config_file, settings):
+    """Where the control API listens: ("unix", path), ("tcp", (host, port)) or None when disabled"""
+    if settings.get("control") is False: return None
+    port = settings.get("control_port")
+    if port: return ("tcp", ("127.0.0.1", port))
+    if os.name == "posix":
+        return ("unix", settings.get("control_socket") or os.path.abspath(os.path.splitext(config_file)[0] + ".sock"))
+    return None  # Windows has no filesystem-permissioned socket; set control_port to opt in
+
+def control_request(config_file, settings, request, timeout=10.0):
+    """Client side: sends one request to a running guardian and returns its decoded reply"""
+    address = control_address(config_file, settings)
+    if address is None:
+        raise ControlError("control API is disabled (set settings.control_port on Windows)")
+    kind, where = address
+    if kind == "unix":
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(where)
+    else:
+        sock = socket.create_connection(where, timeout=timeout)
+        with open(os.path.splitext(config_file)[0] + ".token", encoding="utf-8") as f:
+            request = dict(request, token=f.read().strip())
+    with sock:
+        sock.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk: break
+            data += chunk
+    if not data:
+        raise ControlError("guardian closed the connection without replying")
+    return json.loads(data)
+
+class ControlServer:
+    """Newline-delimited JSON control API served from the engine's event loop.
+
+    Reads answer from the state the checks already keep in memory; mutations go
+    through the same engine methods the GUI uses, on the thread that owns the
+    entry list (see GuardianEngine.on_owner).
+    """
+    MUTATIONS = ("start", "stop", "restart", "add", "remove")
+    # Entry settings that must be numbers above zero; max_restarts may also be 0 (quarantine on the first crash)
+    POSITIVE_FIELDS = ("interval", "max_interval", "busy_cpu", "max_rss_mb", "max_cpu_percent", "leak_mb_per_hour",
+                       "leak_min_r2", "rss_window", "cpu_window", "leak_window", "ready_timeout",
+                       "restart_window", "backoff_base", "backoff_max", "stable_after")
+    MAX_LINE = 1 << 20
+    BACKLOG = 1024  # Bursts of scripted clients connect faster than the loop accepts
+
+    def __init__(self, engine, address):
+        self.engine = engine
+        self.address = address
+        self.token = None
+        self.inode = None  # Our socket file; a later guardian may have replaced it by the time we close
+        self.server = engine.runtime.submit(self.listen()).result(timeout=10)
+        kind, where = address
+        logging.info(f"Control API listening on {where if kind == 'unix' else '%s:%d' % where}")
+
+    async def listen(self):
+        kind, where = self.address
+        if kind == "tcp":
+            # Loopback TCP is reachable by every local user, so requests must carry this token
+            self.token = uuid.uuid4().hex
+            token_file = os.path.splitext(self.engine.config_file)[0] + ".token"
+            fd = os.open(token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f: f.write(self.token)
+            return await asyncio.start_server(self.handle, *where, limit=self.MAX_LINE, backlog=self.BACKLOG)
+
+        if os.path.exists(where):
+            try:
+                _, writer = await asyncio.open_unix_connection(where)
+                writer.close()
+                raise ControlError(f"another guardian is already serving {where}")
+            except (ConnectionError, FileNotFoundError):
+                os.unlink(where)  # Left behind by a guardian that did not exit cleanly
+        server = await asyncio.start_unix_server(self.handle, where, limit=self.MAX_LINE, backlog=self.BACKLOG)
+        os.chmod(where, 0o600)
+        self.inode = os.stat(where).st_ino
+        return server
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line: break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict): raise ControlError("request must be a JSON object")
+                    if self.token is not None and request.get("token") != self.token: raise ControlError("invalid token")
+                    reply = {"ok": True, "result": await self.dispatch(request)}
+                except ControlError as e:
+                    reply = {"ok": False, "error": str(e)}
+                except json.JSONDecodeError as e:
+                    reply = {"ok": False, "error": f"invalid JSON: {e}"}
+                except Exception as e:
+                    reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass  # Client went away or sent a line over MAX_LINE
+        finally:
+            writer.close()
+
+    async def dispatch(self, request):
+        command = request.get("cmd")
+        handler = getattr(self, f"cmd_{command}", None) if isinstance(command, str) else None
+        if handler is None:
+            raise ControlError(f"unknown command {command!r}")
+        if command in self.MUTATIONS:
+            # The GUI renders cards from the same list, so changes wait for its thread
+            return await asyncio.wrap_future(self.engine.on_owner(lambda: handler(request)))
+        return handler(request)
+
+    def find(self, request):
+        """Resolves an entry by "id", falling back to a unique "name" """
+        key = request.get("id") or request.get("name")
+        if not key: raise ControlError("missing entry id or name")
+        procs = list(self.engine.processes)
+        for proc in procs:
+            if proc.get("id") == key: return proc
+        matches = [proc for proc in procs if proc.get("name") == key]
+        if len(matches) == 1: return matches[0]
+        raise ControlError(f"{'ambiguous' if matches else 'no such'} entry {key!r}")
+
+    def describe(self, proc):
+        cpu, rss = proc.get("usage", (None, None))
+        popen = proc.get("popen")
+        policy = proc.get("policy")
+        return {
+            "id": proc.get("id"),
+            "name": proc.get("name"),
+            "path": proc.get("path"),
+            "args": proc.get("args", ""),
+            "monitoring": bool(proc.get("monitoring")),
+            "up": bool(proc.get("up")),
+            "status": proc.get("status"),
+            "pid": popen.pid if popen is not None and popen.returncode is None else None,
+            "cpu_percent": cpu,
+            "rss_bytes": rss,
+            "restarts": proc.get("restart_count", 0),
+            "quarantined": bool(policy is not None and policy.quarantined),
+            "interval": proc.get("pace", proc.get("interval", 5)),
+        }
+
+    def cmd_list(self, request):
+        return [self.describe(proc) for proc in list(self.engine.processes)]
+
+    def cmd_status(self, request):
+        if request.get("id") or request.get("name"):
+            return self.describe(self.find(request))
+        engine = self.engine
+        procs = list(engine.processes)
+        return {
+            "entries": len(procs),
+            "monitoring": sum(1 for proc in procs if proc.get("monitoring")),
+            "up": sum(1 for proc in procs if proc.get("up")),
+            "checks": engine.scheduler.checks,
+            "sweep": engine.scanner.stats_text(),
+            "fleet_ready_seconds": engine.fleet_ready_seconds,
+        }
+
+    def cmd_history(self, request):
+        entry_id = self.find(request)["id"] if request.get("id") or request.get("name") else None
+        return self.engine.history(float(request.get("days", 7)), entry_id)
+
+    def cmd_output(self, request):
+        proc = self.find(request)
+        if request.get("crash"):
+            data = self.engine.events.attachment(proc["id"])
+            return data.decode('utf-8', 'replace') if data is not None else ""
+        return self.engine.capture.text(proc)
+
+    def cmd_profile(self, request):
+        profiler = self.engine.profiler
+        if profiler is None: raise ControlError("the guardian was not started with --profile")
+        return {"path": os.path.abspath(profiler.path), "samples": profiler.write()}
+
+    def cmd_start(self, request):
+        proc = self.find(request)
+        if not self.engine.start_monitoring(proc):
+            self.engine.release(proc)  # Already monitored; starting again lifts a quarantine
+        return self.describe(proc)
+
+    def cmd_stop(self, request):
+        proc = self.find(request)
+        if request.get("kill"): self.engine.kill_tree(proc)
+        elif proc.get("monitoring"): self.engine.stop_monitoring(proc)
+        return self.describe(proc)
+
+    def cmd_restart(self, request):
+        proc = self.find(request)
+        self.engine.restart_tree(proc)
+        return self.describe(proc)
+
+    def cmd_add(self, request):
+        entry = request.get("entry")
+        if not isinstance(entry, dict) or not entry.get("path") or not entry.get("name"):
+            raise ControlError("add needs an entry object with path and name")
+        for key in ("path", "name", "args"):
+            if not isinstance(entry.get(key, ""), str): raise ControlError(f"{key} must be a string")
+        for key in self.POSITIVE_FIELDS:
+            value = entry.get(key)
+            if value is not None and (not isinstance(value, (int, float)) or isinstance(value, bool) or not 0 < value < float("inf")):
+                raise ControlError(f"{key} must be a number above 0")
+        restarts = entry.get("max_restarts")
+        if restarts is not None and (not isinstance(restarts, int) or isinstance(restarts, bool) or restarts < 0):
+            raise ControlError("max_restarts must be a whole number, 0 or more")
+        if not os.path.exists(entry["path"]):
+            raise ControlError(f"file not found: {entry['path']}")
+        # The id names the entry's output and journal files, so it is always generated here
+        process_info = {k: v for k, v in entry.items() if k not in GuardianEngine.RUNTIME_KEYS and k != "id"}
+        process_info.setdefault("args", "")
+        process_info.setdefault("interval", 5)
+        process_info.setdefault("enabled", True)
+        if isinstance(process_info.get("probe"), str):
+            process_info["probe"] = parse_probe(process_info["probe"])
+        if process_info.get("probe") is None:
+            process_info.pop("probe", None)
+        else:
+            problem = probe_problem(process_info["probe"])
+            if problem: raise ControlError(problem)
+        proc = self.engine.add_process(process_info)
+        self.engine.publish(proc, listed=True)
+        logging.info(f"Added new process configuration: {proc['name']} (control API)")
+        if request.get("start"): self.engine.start_monitoring(proc)
+        return self.describe(proc)
+
+    def cmd_remove(self, request):
+        proc = self.find(request)
+        self.engine.remove_process(proc)
+        self.engine.publish(proc, listed=False)
+        logging.info(f"Removed process configuration: {proc['name']} (control API)")
+        return {"id": proc["id"], "removed": True}
+
+    def close(self):
+        kind, where = self.address
+        self.engine.runtime.call(self.server.close)
+        try:
+            if kind == "unix":
+                if os.stat(where).st_ino == self.inode: os.unlink(where)
+            else:
+                os.unlink(os.path.splitext(self.engine.config_file)[0] + ".token")
+        except OSError:
+            pass
+
+class StartupPlanner:
+    """Starts entries in dependency order (Kahn's algorithm), at most `concurrency` of them coming up at once"""
+    POLL = 0.1
+    PROBE_EVERY = 0.5
+    DEFAULT_TIMEOUT = 60  # Seconds an entry may take to become ready before its dependents go ahead anyway
+
+    def __init__(self, engine, procs, concurrency):
+        self.engine = engine
+        self.concurrency = max(1, concurrency)
+        self.cancelled = threading.Event()
+        self.gates = {}  # id(proc) -> probe config that must pass before the entry counts as ready
+        threading.Thread(target=self.run, args=(procs,), daemon=True, name="startup-planner").start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def plan(self, procs):
+        """Returns (dependents, indegree) for the entries being started; cycles are broken with an error"""
+        lookup = {}
+        for proc in self.engine.processes:
+            lookup.setdefault(proc["name"], proc)
+        for proc in self.engine.processes:
+            lookup[proc["id"]] = proc
+        members = {id(proc) for proc in procs}
+        
+        dependents, indegree = {}, {}
+        for proc in procs:
+            spec = proc.get("ready") or proc.get("probe")
+            if spec:
+                problem = "not a probe" if not isinstance(spec, (str, dict)) else None
+                if problem is None:
+                    if isinstance(spec, str): spec = parse_probe(spec)
+                    problem = probe_problem(spec)
+                if problem:
+                    logging.error(f"Startup: {proc['name']} has an unusable ready condition ({problem}); "
+                                  f"ready once running")
+                else:
+                    self.gates[id(proc)] = spec
+            deps = set()
+            for ref in proc.get("depends_on", []):
+                dep = lookup.get(ref)
+                if dep is None or dep is proc:
+                    logging.warning(f"Startup: {proc['name']} depends on unknown entry '{ref}', ignored")
+                    continue
+                # Dependencies outside this batch are either already up or deliberately stopped
+                if id(dep) in members and id(dep) not in deps:
+                    deps.add(id(dep))
+                    dependents.setdefault(id(dep), []).append(proc)
+            indegree[id(proc)] = len(deps)
+        
+        # Dry run of Kahn's algorithm: whatever never reaches indegree 0 sits on (or behind) a cycle
+        left = dict(indegree)
+        queue = collections.deque(key for key, n in left.items() if n == 0)
+        while queue:
+            for dep in dependents.get(queue.popleft(), ()):
+                left[id(dep)] -= 1
+                if left[id(dep)] == 0: queue.append(id(dep))
+        stuck = [proc for proc in procs if left[id(proc)] > 0]
+        if stuck:
+            names = ", ".join(proc["name"] for proc in stuck)
+            logging.error(f"Startup: dependency cycle among {names}; starting them without ordering")
+            for proc in stuck:
+                indegree[id(proc)] = 0
+        return dependents, indegree
+
+    def run(self, procs):
+        start = time.monotonic()
+        try:
+            dependents, indegree = self.plan(procs)
+        except Exception as e:
+            logging.error(f"Startup planner error: {str(e)}")
+            dependents, indegree = {}, {id(proc): 0 for proc in procs}
+        queue = collections.deque(proc for proc in procs if indegree[id(proc)] == 0)
+        for proc in procs:
+            if indegree[id(proc)]: self.engine.publish(proc, status="⏳ Waiting for dependencies")
+        
+        starting = {}  # id(proc) -> {"proc", "since", "future", "next_probe"}
+        ready = not_ready = 0
+        while (queue or starting) and not self.cancelled.is_set():
+            # Slots are held until an entry is ready, so cold starts never pile up beyond the cap
+            while queue and len(starting) < self.concurrency:
+                proc = queue.popleft()
+                self.engine.start_monitoring(proc)
+                starting[id(proc)] = {"proc": proc, "since": time.monotonic(), "future": None, "next_probe": 0.0}
+            
+            now = time.monotonic()
+            for key, item in list(starting.items()):
+                proc = item["proc"]
+                try:
+                    if self.is_ready(item, now):
+                        ready += 1
+                        logging.info(f"Startup: {proc['name']} ready after {now - item['since']:.1f}s")
+                    elif now - item["since"] > proc.get("ready_timeout", self.DEFAULT_TIMEOUT) or self.failed(proc):
+                        not_ready += 1
+                        logging.warning(f"Startup: {proc['name']} not ready after {now - item['since']:.1f}s; "
+                                        f"starting its dependents anyway")
+                    else:
+                        continue
+                except Exception:
+                    # One broken entry must not hold up the rest of the fleet
+                    not_ready += 1
+                    logging.exception(f"Startup: cannot tell whether {proc['name']} is ready; starting its dependents anyway")
+                del starting[key]
+                for dep in dependents.get(key, ()):
+                    indegree[id(dep)] -= 1
+                    if indegree[id(dep)] == 0: queue.append(dep)
+            self.cancelled.wait(self.POLL)
+        
+        if self.cancelled.is_set():
+            logging.info("Startup cancelled")
+            return
+        elapsed = time.monotonic() - start
+        self.engine.fleet_ready_seconds = elapsed
+        summary = f"{ready} of {len(procs)} entries ready in {elapsed:.1f}s"
+        if not_ready: summary += f" ({not_ready} not ready)"
+        logging.info(f"Startup: {summary} (concurrency {self.concurrency})")
+
+    def failed(self, proc):
+        policy = proc.get("policy")
+        return policy is not None and policy.quarantined
+
+    def is_ready(self, item, now):
+        """Running, and passing the entry's `ready` condition (or its health probe) if it has one"""
+        proc = item["proc"]
+        if not proc.get("monitoring"):
+            return True  # Stopped by hand meanwhile; do not hold up its dependents
+        if not (proc.get("up") or self.engine.tracked_child(proc)):
+            return False
+        spec = self.gates.get(id(proc))
+        if not spec:
+            return True
+        
+        future = item["future"]
+        if future is None:
+            if now >= item["next_probe"]:
+                item["future"] = self.engine.runtime.submit(self.engine.probes.probe_once(spec))
+                item["next_probe"] = now + self.PROBE_EVERY
+            return False
+        if not future.done():
+            return False
+        item["future"] = None
+        try:
+            return future.result()[0]
+        except Exception:
+            return False
+
+class GuardianEngine:
+    """Monitoring and restart logic shared by the GUI and the headless daemon"""
+    SAVE_DELAY = 2.0  # Config writes are coalesced over this many seconds
+    PACE_GROWTH = 1.5  # Adaptive intervals stretch by this factor per calm check
+    RUNTIME_KEYS = ('monitoring', 'popen', 'child_proc', 'exit_time', 'restart_count', 'history', 'policy', 'restart_at', 'unresponsive', 'tree', 'restart_request',
+                    'up', 'usage', 'last_seen', 'detect_latency', 'restart_latency',
+                    'limits', 'limit_restarts', 'pace', 'status', 'restarting', 'adopted')
+
+    def __init__(self, config_file="guardian_config.json"):
+        self.config_file = config_file
+        self.processes = []
+        self.settings = {}  # Guardian-wide options, e.g. metrics_port
+        self.save_lock = threading.Lock()
+        self.save_timer = None
+        self.journal = RestartJournal(os.path.splitext(config_file)[0] + ".journal")
+        self.listener = None  # listener(proc, fields) receives status/cpu/ram/restarts updates
+        self.owner = None  # owner(fn) runs fn on the thread that owns the entry list (the Tk thread in the GUI)
+        
+        # Load previous settings
+        self.load_config()
+        self.events = EventStore(os.path.splitext(config_file)[0] + ".events", self.settings.get("event_retention_days", 30))
+        
+        backend = sampler_backend(self.settings.get("sampler", "auto"))
+        self.scanner = ProcessScanner(backend=backend)
+        self.cpu_sampler = CpuSampler(backend)
+        self.pruned_sweep = 0
+        self.child_watcher = ChildWatcher(self.on_child_exit)
+        self.scheduler = MonitorScheduler(self.check_process, prepare=self.prepare_checks)
+        self.scheduler.budget = self.settings.get("max_checks_per_second")
+        # Terminations wait up to 5 s for an app to exit, so they get their own threads
+        # instead of tying up the check workers that detect crashes
+        self.terminator = ThreadPoolExecutor(max_workers=16, thread_name_prefix="guardian-terminate")
+        self.runtime = AsyncRuntime()
+        self.probes = ProbeEngine(self.runtime, self.on_probe_failed, self.on_probe_failing)
+        self.capture = OutputCapture(self.runtime, os.path.splitext(config_file)[0] + ".output", self.settings)
+        self.exporter = None
+        self.control = None
+        self.profiler = None  # SamplingProfiler when started with --profile
+        self.planner = None
+        self.fleet_ready_seconds = None
+        self.metrics_lock = threading.Lock()
+        self.metrics_cache = (0.0, b"")
+        self.me = psutil.Process()
+        self.me.cpu_percent()
+        self.cpu_reading = (time.monotonic(), 0.0)
+
+    def record_event(self, proc, kind, **details):
+        """Adds a crash/restart event to the history store; a failed write is logged, never raised"""
+        try:
+            return self.events.append(proc["id"], proc["name"], kind, **details)
+        except Exception as e:
+            logging.error(f"Error recording {kind} event for {proc['name']}: {str(e)}")
+
+    def captures(self, proc):
+        return proc.get("capture_output", self.settings.get("capture_output", False))
+
+    def save_crash_output(self, proc, ts):
+        """Attaches the entry's captured output tail to its crash event"""
+        def attach(data):
+            try:
+                self.events.attach(proc["id"], ts, data)
+            except Exception as e:
+                logging.error(f"Error saving crash output for {proc['name']}: {str(e)}")
+        self.capture.after_exit(proc, attach)
+
+    def history(self, days=7, entry_id=None):
+        """EventStore.report() over the last `days` days, with current entry names"""
+        until = time.time()
+        names = {proc["id"]: proc["name"] for proc in self.processes}
+        return self.events.report(until - days * 86400, until, names, entry_id)
+
+    def history_summary(self, days=1):
+        """One log line: failures over the last `days` and the worst offenders"""
+        entries = [stats for stats in self.history(days)["entries"] if stats["failures"]]
+        worst = ", ".join(f"{stats['name']} ({stats['failures']})" for stats in entries[:5])
+        return f"Crash history, last {days * 24:.0f} h: {sum(s['failures'] for s in entries)} failures" + (f"; top: {worst}" if worst else "")
+
+    def on_owner(self, fn):
+        """Runs fn where the entry list may change and returns a Future with its result"""
+        future = Future()
+        def run():
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+        if self.owner is None: run()
+        else: self.owner(run)
+        return future
+
+    def publish(self, proc, **fields):
+        if "status" in fields: proc["status"] = fields["status"]  # Kept for the control API
+        if self.listener:
+            self.listener(proc, fields)
+
+    def start_monitoring(self, proc):
+        if proc.get("monitoring"): return False
+        proc["monitoring"] = True
+        proc["policy"] = RestartPolicy(proc)
+        proc["limits"] = ResourceGuard.for_entry(proc)
+        proc.pop("restart_at", None)
+        self.scheduler.add(proc)
+        if proc.get("probe"): self.probes.start(proc)
+        logging.info(f"Started monitoring: {proc['name']}")
+        return True
+
+    def stop_monitoring(self, proc):
+        proc["monitoring"] = False
+        self.scheduler.remove(proc)
+        if proc.get("probe"): self.probes.stop(proc)
+        proc["up"] = False
+        proc.pop("usage", None)
+        self.publish(proc, status="⚫ Stopped", cpu=0.0, ram=0.0)
+        logging.info(f"Stopped monitoring: {proc['name']}")
+
+    def release(self, proc):
+        """Clears a quarantine and lets the entry restart on its next check"""
+        if proc.get("monitoring"):
+            proc["policy"] = RestartPolicy(proc)
+            proc.pop("restart_at", None)
+            logging.info(f"Quarantine released: {proc['name']}")
+            self.scheduler.wake(proc)
+
+    def start_all(self):
+        """Starts every stopped entry through the startup planner, dependencies first"""
+        if self.planner is not None: self.planner.cancel()
+        procs = [proc for proc in self.processes if not proc.get("monitoring")]
+        if procs:
+            concurrency = self.settings.get("startup_concurrency", max(2, os.cpu_count() or 2))
+            self.planner = StartupPlanner(self, procs, concurrency)
+
+    def stop_all(self):
+        if self.planner is not None: self.planner.cancel()
+        for proc in self.processes:
+            if proc.get("monitoring"): self.stop_monitoring(proc)
+
+    def status_text(self):
+        active = sum(1 for proc in self.processes if proc.get("monitoring"))
+        text = f"Monitoring {active} of {len(self.processes)} processes  |  Guardian CPU: {self.guardian_cpu():.1f}%"
+        sweep_stats = self.scanner.stats_text()
+        if sweep_stats:
+            text += f"  |  {sweep_stats}"
+        return text
+
+    def guardian_cpu(self):
+        """The guardian's own CPU%, averaged between readings taken at least a second apart"""
+        read_at, cpu = self.cpu_reading
+        now = time.monotonic()
+        if now - read_at >= 1.0:
+            cpu = self.me.cpu_percent()
+            self.cpu_reading = (now, cpu)
+        return cpu
+
+    def report_startup(self, mode):
+        """Logs how long the guardian took to become ready and how much memory it holds"""
+        me = psutil.Process()
+        elapsed = (time.time() - me.create_time()) * 1000
+        rss = me.memory_info().rss / 1024 / 1024
+        gui = "loaded" if "tkinter" in sys.modules else "not loaded"
+        logging.info(f"Startup ({mode}): ready in {elapsed:.0f} ms, RSS {rss:.1f} MB, tkinter {gui}")
+
+    def prepare_checks(self, batch, fresh):
+        """One shared sweep per batch serves every due entry; an exit notice forces a fresh one"""
+        # Tree tracking needs the parent index even while the launcher itself is our live child
+        if any(proc.get("track_tree", True) or self.tracked_child(proc) is None for proc in batch):
+            self.scanner.refresh(max_age=0 if fresh else None)
+        if self.scanner.sweeps != self.pruned_sweep:
+            self.pruned_sweep = self.scanner.sweeps
+            self.cpu_sampler.prune(self.scanner.pids)
+
+    def check_process(self, proc):
+        """Runs on a scheduler worker and returns the delay until the entry's next check"""
+        if not proc.get("monitoring", False):
+            return proc.get("interval", 5)
+        try:
+            if proc.pop("restart_request", False):
+                proc["restarting"] = True
+                self.terminator.submit(self.finish_restart, proc)
+                return proc.get("interval", 5)
+            if proc.get("restarting"):
+                return proc.get("interval", 5)  # The terminator starts it again and wakes this check
+            
+            # Our own live child needs no table lookup at all
+            root = self.owned_root(proc, adopt=True)
+            members = self.resolve_tree(proc, root) if proc.get("track_tree", True) else [root] if root else []
+            
+            # CPU and RSS are summed over the whole tree; shared pages are counted once per process
+            alive, root_alive, cpu, rss = 0, False, 0.0, 0
+            for member in members:
+                try:
+                    with timings.phase("sample"):
+                        status, member_cpu, member_rss = self.cpu_sampler.sample(member)
+                except psutil.NoSuchProcess:
+                    continue  # Exited between the sweep and the sample
+                if status in [psutil.STATUS_ZOMBIE, psutil.STATUS_DEAD]:
+                    # Smart Crash Detection
+                    if member is root:
+                        logging.warning(f"Process {proc['name']} is detected as {status}. Restarting...")
+                        self.publish(proc, status=f"⚠️ {status.title()}")
+                    continue
+                alive += 1
+                root_alive = root_alive or member is root
+                cpu += member_cpu
+                rss += member_rss
+            
+            proc["up"] = alive > 0
+            if alive:
+                ram = rss / 1024 / 1024
+                proc["usage"] = (cpu, rss)
+                proc["last_seen"] = time.monotonic()
+                
+                self.publish(proc, cpu=cpu, ram=ram)
+                if "history" not in proc: proc["history"] = MetricsHistory()
+                proc["history"].add(cpu, ram)
+                
+                if root_alive:
+                    self.publish(proc, status="🟢 Running" + (f" ({alive} procs)" if alive > 1 else ""))
+                else:
+                    # The launcher is gone but its workers still serve; starting it again would duplicate them
+                    self.publish(proc, status=f"🟡 Launcher exited, {alive} workers running")
+                proc["policy"].on_healthy(time.monotonic())
+                
+                violation = None
+                limits = proc.get("limits")
+                if limits is not None:
+                    violation = limits.check(time.monotonic(), cpu, ram)
+                    if violation: self.on_limit_exceeded(proc, violation)
+                
+                calm = (root_alive and not violation and cpu < proc.get("busy_cpu", 80)
+                        and not (proc.get("probe") and self.probes.failing(proc)))
+                return self.pace(proc, calm)
+            else:
+                if "restart_at" not in proc and not proc["policy"].quarantined:
+                    now = time.monotonic()
+                    # A watched child's exit is timestamped by the watcher; one found by polling
+                    # happened at some point since the last healthy check
+                    since = proc.get("exit_time") or proc.get("last_seen")
+                    if since:
+                        proc["detect_latency"] = now - since
+                        proc.setdefault("exit_time", now)
+                        popen = proc.get("popen")
+                        ts = self.record_event(proc, "crash", pid=popen.pid if popen else 0,
+                                               code=popen.returncode if popen else None, latency=proc["detect_latency"])
+                        if ts and self.captures(proc):
+                            self.save_crash_output(proc, ts)
+                    proc.pop("usage", None)
+                    proc.pop("pace", None)
+                    self.publish(proc, status="🔴 Crashed/Closed")
+                    logging.warning(f"Process {proc['name']} not found. Restarting...")
+                return self.handle_crash(proc)
+            
+        except Exception as e:
+            logging.error(f"Monitor Error {proc['name']}: {str(e)}")
+        return proc.get("interval", 5)
+
+    def pace(self, proc, calm):
+        """Delay until the next check: the entry's fixed interval, or in adaptive mode one that
+        stretches toward max_interval while the app is calm and snaps back on any trouble"""
+        interval = proc.get("interval", 5)
+        if not proc.get("adaptive", self.settings.get("adaptive", False)):
+            return interval
+        if not calm:
+            proc.pop("pace", None)
+            return interval
+        proc["pace"] = min(proc.get("pace", interval) * self.PACE_GROWTH, max(interval, proc.get("max_interval", 60)))
+        return proc["pace"]
+
+    def handle_crash(self, proc):
+        """Restarts a missing entry as its restart policy allows; returns the delay until the next check"""
+        policy = proc["policy"]
+        interval = proc.get("interval", 5)
+        now = time.monotonic()
+        if policy.quarantined:
+            self.publish(proc, status="⛔ Quarantined")
+            return interval
+        
+        if "restart_at" not in proc:
+            if policy.last_start is None and not policy.crashes:
+                delay = 0.0  # Launching an app that was not running when monitoring began
+            else:
+                delay = policy.on_crash(now)
+            if delay is None:
+                logging.error(f"Process {proc['name']} crashed {len(policy.crashes)} times in {policy.window}s. "
+                              f"Quarantined, no more restarts until released.")
+                self.record_event(proc, "quarantine")
+                self.publish(proc, status="⛔ Quarantined")
+                return interval
+            if delay > 0:
+                logging.warning(f"Process {proc['name']} is crash-looping. Next restart in {delay:.1f}s.")
+            proc["restart_at"] = now + delay
+        
+        remaining = proc["restart_at"] - now
+        if remaining > 0:
+            self.publish(proc, status=f"⏳ Restart in {remaining:.0f}s")
+            return min(interval, remaining)
+        
+        del proc["restart_at"]
+        self.start_process(proc)
+        policy.on_started(time.monotonic())
+        return interval
+
+    def on_limit_exceeded(self, proc, violation):
+        # A fresh guard has to fill its windows again, so one violation triggers one action
+        proc["limits"] = ResourceGuard.for_entry(proc)
+        self.record_event(proc, "limit")
+        if proc.get("limit_action", "restart") != "restart":
+            logging.warning(f"Process {proc['name']} exceeded its resource limits: {violation}")
+            return
+        logging.warning(f"Process {proc['name']} exceeded its resource limits: {violation}. Restarting...")
+        self.publish(proc, status="🟠 Over limit")
+        proc["limit_restarts"] = proc.get("limit_restarts", 0) + 1
+        self.restart_tree(proc)
+
+    def on_probe_failing(self, proc):
+        """Called on the async loop at the first failed probe: a relaxed entry goes back to its interval now"""
+        if proc.pop("pace", None) is not None:
+            self.scheduler.wake(proc)
+
+    def on_probe_failed(self, proc, reason):
+        """Called on the async loop when an entry failed its health probe too many times in a row"""
+        policy = proc.get("policy")
+        if not proc.get("monitoring") or "restart_at" in proc or policy is None or policy.quarantined:
+            return
+        if proc.get("unresponsive"):
+            return  # Already being restarted
+        proc["unresponsive"] = True
+        proc.pop("pace", None)
+        self.record_event(proc, "unresponsive")
+        logging.warning(f"Process {proc['name']} is not responding ({reason}). Restarting...")
+        self.publish(proc, status="🟡 Not Responding")
+        self.terminator.submit(self.restart_unresponsive, proc)
+
+    def finish_restart(self, proc):
+        """Runs on the terminator pool: terminates the entry's tree, starts it again and resumes its checks"""
+        try:
+            self.terminate_tree(proc)
+            if proc.get("monitoring"):
+                self.start_process(proc)
+                proc["policy"].on_started(time.monotonic())
+        except Exception as e:
+            logging.error(f"Restart Error {proc['name']}: {str(e)}")
+        finally:
+            proc.pop("restarting", None)
+            self.scheduler.wake(proc)
+
+    def restart_unresponsive(self, proc):
+        try:
+            if not self.terminate_tree(proc):
+                return
+        finally:
+            proc.pop("unresponsive", None)
+        # The woken check sees the app gone and restarts it through the restart policy
+        proc["exit_time"] = time.monotonic()
+        self.scheduler.wake(proc)
+
+    def resolve_tree(self, proc, root):
+        """Live members of an entry's process tree, root first and parents before children"""
+        scanner = self.scanner
+        members = {}
+        def add_branch(top):
+            members[top.pid] = top
+            for pid in scanner.descendants(top.pid):
+                if pid in members: continue
+                p = scanner.process(pid)
+                if p is not None: members[pid] = p
+        
+        if root is not None:
+            add_branch(root)
+        # Members seen on earlier checks keep the tree together after their launcher exits
+        # and they are re-parented; create_time guards against a recycled pid
+        for pid, created in proc.get("tree", {}).items():
+            if pid in members: continue
+            p = scanner.process(pid)
+            try:
+                if p is not None and p.create_time() == created:
+                    add_branch(p)
+            except psutil.Error:
+                pass
+        
+        tree = {}
+        for pid, p in members.items():
+            try:
+                tree[pid] = p.create_time()
+            except psutil.Error:
+                pass
+        proc["tree"] = tree
+        return list(members.values())
+
+    def terminate_tree(self, proc, timeout=5):
+        """Stops every process in the entry's tree, leaves first; returns how many were signalled"""
+        self.scanner.refresh(max_age=0)
+        # Only a tree this entry started or adopted; a name match may belong to someone else
+        claimed = self.claimed_pids(proc)
+        members = [p for p in self.resolve_tree(proc, self.owned_root(proc)) if p.pid not in claimed]
+        # Children go first so a launcher cannot respawn workers while it is being stopped
+        for p in reversed(members):
+            try:
+                p.terminate()
+            except psutil.Error:
+                pass
+        gone, alive = psutil.wait_procs(members, timeout=timeout)
+        for p in alive:
+            try:
+                p.kill()
+            except psutil.Error:
+                pass
+        proc["tree"] = {}
+        if members:
+            logging.info(f"Terminated process tree of {proc['name']} ({len(members)} processes, {len(alive)} killed)")
+        return len(members)
+
+    def restart_tree(self, proc):
+        """Restarts the entry's whole process tree"""
+        if proc.get("monitoring"):
+            # Routed through the entry's check, which hands off to finish_restart, so a restart can never race it
+            proc["restart_request"] = True
+            self.scheduler.wake(proc)
+        else:
+            def restart():
+                self.terminate_tree(proc)
+                self.start_process(proc)
+            self.terminator.submit(restart)
+
+    def kill_tree(self, proc):
+        """Stops monitoring an entry and terminates its whole process tree"""
+        self.stop_monitoring(proc)
+        self.terminator.submit(self.terminate_tree, proc)
+
+    def tracked_child(self, proc):
+        popen = proc.get("popen")
+        child = proc.get("child_proc")
+        if popen is None or child is None or popen.returncode is not None:
+            return None
+        try:
+            return child if child.is_running() else None
+        except psutil.Error:
+            return None
+
+    def owned_root(self, proc, adopt=False):
+        """The entry's own process: its live child, or one it adopted before starting any.
+        With adopt, an entry that never had a child takes over a matching process nobody else claims"""
+        child = self.tracked_child(proc)
+        if child is not None:
+            return child
+        adopted = proc.get("adopted")
+        if adopted is not None:
+            try:
+                return adopted if adopted.is_running() else None
+            except psutil.Error:
+                return None
+        if not adopt or proc.get("popen") is not None:
+            return None
+        process = self.scanner.find(proc, exclude=self.claimed_pids(proc))
+        if process is not None:
+            proc["adopted"] = process
+            logging.info(f"Adopted running process of {proc['name']} (PID {process.pid})")
+        return process
+
+    def claimed_pids(self, proc):
+        """Pids owned by every other entry, plus the guardian itself"""
+        pids = {os.getpid()}
+        for other in list(self.processes):
+            if other is proc: continue
+            popen = other.get("popen")
+            if popen is not None and popen.returncode is None: pids.add(popen.pid)
+            adopted = other.get("adopted")
+            if adopted is not None: pids.add(adopted.pid)
+            pids.update(other.get("tree", ()))
+        return pids
+
+    def on_child_exit(self, proc, popen):
+        """Called from the child watcher thread as soon as a started child exits"""
+        if not proc.get("monitoring", False) or proc.get("popen") is not popen:
+            return
+        proc["exit_time"] = time.monotonic()
+        logging.warning(f"Process {proc['name']} (PID {popen.pid}) exited with code {popen.returncode}.")
+        self.scheduler.wake(proc)
+
+    def start_process(self, proc):
+        exit_time = proc.pop("exit_time", None)
+        relaunch = exit_time is not None or proc.get("popen") is not None
+        start = time.perf_counter()
+        try:
+            # --- Security Fix Here: No Shell=True ---
+            cmd = [proc["path"]]
+            if proc.get("args"):
+                # Parse string args into list safely
+                cmd.extend(shlex.split(proc["args"]))
+            
+            # Set cwd to the executable's folder to prevent path errors
+            process_dir = os.path.dirname(proc["path"])
+            
+            # Captured children append to their entry's output file rather than a pipe, so they never
+            # depend on the guardian staying alive; stderr is merged to keep the streams in order
+            stdout = self.capture.child_stdout(proc) if self.captures(proc) else None
+            try:
+                popen = subprocess.Popen(cmd, shell=False, cwd=process_dir,
+                                         stdout=stdout, stderr=subprocess.STDOUT if stdout else None)
+            finally:
+                if stdout is not None: stdout.close()  # The child has its own handle now
+            
+            # Keep the handle so the child watcher can report its exit immediately
+            proc["popen"] = popen
+            proc.pop("adopted", None)
+            try:
+                proc["child_proc"] = psutil.Process(popen.pid)
+            except psutil.Error:
+                proc.pop("child_proc", None)
+            self.child_watcher.watch(popen, proc)
+            if proc.get("probe"): self.probes.reset(proc)
+            if proc.get("limits") is not None: proc["limits"] = ResourceGuard.for_entry(proc)
+            proc.pop("pace", None)
+            proc["last_seen"] = time.monotonic()
+            
+            proc["restart_count"] = proc.get("restart_count", 0) + 1
+            self.publish(proc, restarts=proc["restart_count"])
+            self.journal.record(proc["id"], proc["restart_count"])
+            timings.observe("restart", time.perf_counter() - start)
+            
+            latency = ""
+            if exit_time:
+                proc["restart_latency"] = time.monotonic() - exit_time
+                latency = f", {proc['restart_latency'] * 1000:.0f} ms after exit"
+            self.record_event(proc, "restart" if relaunch else "start", pid=popen.pid,
+                              latency=proc["restart_latency"] if exit_time else None)
+            logging.info(f"Process restarted: {proc['name']} (Count: {proc['restart_count']}{latency})")
+            
+        except Exception as e:
+            logging.error(f"Failed to start {proc['name']}: {str(e)}")
+            self.record_event(proc, "start_failed")
+
+    def new_id(self):
+        """A short hex id no other entry uses; it also names the entry's output and journal records"""
+        used = {proc.get("id") for proc in self.processes}
+        while True:
+            entry_id = uuid.uuid4().hex[:8]
+            if entry_id not in used: return entry_id
+
+    def add_process(self, process_info):
+        process_info["id"] = self.new_id()
+        self.processes.append(process_info)
+        self.save_config()
+        return process_info
+
+    def remove_process(self, proc):
+        if proc.get("monitoring"): self.stop_monitoring(proc)
+        self.processes.remove(proc)
+        self.capture.release(proc)
+        self.save_config()
+
+    def save_config(self):
+        """Debounced: a burst of changes results in one write SAVE_DELAY seconds later"""
+        with self.save_lock:
+            if self.save_timer is None:
+                self.save_timer = threading.Timer(self.SAVE_DELAY, self.flush_config)
+                self.save_timer.daemon = True
+                self.save_timer.start()
+
+    def flush_config(self):
+        with self.save_lock:
+            if self.save_timer is not None:
+                self.save_timer.cancel()
+                self.save_timer = None
+            
+            clean_processes = []
+            for proc in list(self.processes):
+                clean_proc = {k: v for k, v in proc.items() if k not in self.RUNTIME_KEYS}
+                clean_processes.append(clean_proc)
+            
+            config = {"processes": clean_processes}
+            if self.settings: config["settings"] = self.settings
+            try:
+                with timings.phase("save_config"):
+                    write_atomic(self.config_file, json.dumps(config, ensure_ascii=False, indent=4))
+            except Exception as e: print(f"Error saving config: {str(e)}")
+
+    def load_config(self):
+        if os.path.exists(self.config_file):
+            try:
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+                    self.processes = config.get("processes", [])
+                    self.settings = config.get("settings", {})
+            except Exception as e:
+                print(f"Error loading config: {str(e)}")
+                self.processes = []
+        
+        migrated = False
+        for proc in self.processes:
+            if "id" not in proc:
+                proc["id"] = self.new_id()
+                migrated = True
+            # Older configs kept the counter inline; move it into the journal once
+            if proc["id"] not in self.journal.counts and proc.get("restart_count"):
+                self.journal.record(proc["id"], proc["restart_count"])
+            proc["restart_count"] = self.journal.get(proc["id"])
+        if migrated:
+            self.save_config()
+
+    def start_exporter(self, port, host="127.0.0.1"):
+        """Starts the OpenMetrics endpoint; a port that cannot be bound is logged and skipped"""
+        try:
+            self.exporter = MetricsExporter(self.metrics_text, port, host)
+        except OSError as e:
+            logging.error(f"Metrics endpoint on {host}:{port} failed: {str(e)}")
+
+    def start_control(self):
+        """Starts the local control API unless settings.control is false"""
+        address = control_address(self.config_file, self.settings)
+        if address is None: return
+        try:
+            self.control = ControlServer(self, address)
+        except (OSError, ControlError) as e:
+            logging.error(f"Control API on {address[1]} failed: {str(e)}")
+
+    def metrics_text(self, max_age=1.0):
+        """OpenMetrics snapshot of the values the checks already collected; never samples on its own"""
+        with self.metrics_lock:
+            built, body = self.metrics_cache
+            if time.monotonic() - built < max_age:
+                return body
+            body = self.render_metrics().encode("utf-8")
+            self.metrics_cache = (time.monotonic(), body)
+            return body
+
+    def render_metrics(self):
+        families = {}
+        def add(name, kind, help_text, value, proc=None, suffix=None):
+            if name not in families:
+                families[name] = [f"# TYPE {name} {kind}", f"# HELP {name} {help_text}"]
+            sample = name + (suffix or ("_total" if kind == "counter" else ""))
+            if proc is not None:
+                labels = []
+                for key in ("id", "name"):
+                    text = str(proc.get(key, "")).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                    labels.append(f'{key}="{text}"')
+                sample += "{" + ",".join(labels) + "}"
+            families[name].append(f"{sample} {value}")
+        
+        for proc in list(self.processes):
+            add("guardian_monitored", "gauge", "Whether the entry is being monitored.", int(bool(proc.get("monitoring"))), proc)
+            add("guardian_up", "gauge", "Whether the entry's process tree was running at its last check.", int(bool(proc.get("up"))), proc)
+            policy = proc.get("policy")
+            add("guardian_quarantined", "gauge", "Whether the entry stopped restarting after a crash loop.",
+                int(bool(policy is not None and policy.quarantined)), proc)
+            add("guardian_restarts", "counter", "Processes started for the entry.", proc.get("restart_count", 0), proc)
+            add("guardian_limit_restarts", "counter", "Restarts triggered by the entry's resource limits since the guardian started.",
+                proc.get("limit_restarts", 0), proc)
+            usage = proc.get("usage")
+            if usage is not None:
+                add("guardian_cpu_percent", "gauge", "CPU use of the entry's process tree at its last check.", f"{usage[0]:.2f}", proc)
+                add("guardian_rss_bytes", "gauge", "Resident memory of the entry's process tree at its last check.", usage[1], proc)
+            if "detect_latency" in proc:
+                add("guardian_detection_latency_seconds", "gauge",
+                    "Time from the last exit (or last healthy check, when found by polling) to the check that noticed it.",
+                    f"{proc['detect_latency']:.6f}", proc)
+            add("guardian_check_interval_seconds", "gauge", "Current delay between the entry's checks (adaptive entries vary).",
+                proc.get("pace", proc.get("interval", 5)), proc)
+            if "restart_latency" in proc:
+                add("guardian_restart_latency_seconds", "gauge", "Time from noticing the last exit to the replacement starting.",
+                    f"{proc['restart_latency']:.6f}", proc)
+        
+        scheduler, scanner = self.scheduler, self.scanner
+        add("guardian_check_seconds", "summary", "Time spent in entry checks.", scheduler.checks, suffix="_count")
+        add("guardian_check_seconds", "summary", "", f"{scheduler.check_seconds:.6f}", suffix="_sum")
+        add("guardian_check_lag_seconds", "counter", "Total time checks waited past their due time.", f"{scheduler.lag_seconds:.6f}")
+        add("guardian_sweep_seconds", "summary", "Time spent walking the process table.", scanner.sweeps, suffix="_count")
+        add("guardian_sweep_seconds", "summary", "", f"{scanner.total_ms / 1000:.6f}", suffix="_sum")
+        add("guardian_sweep_processes", "gauge", "Processes seen by the last sweep.", scanner.proc_count)
+        if scheduler.budget:
+            add("guardian_check_budget", "gauge", "Configured cap on checks per second across all entries.", scheduler.budget)
+        if self.fleet_ready_seconds is not None:
+            add("guardian_startup_seconds", "gauge", "Time the last fleet startup took until every entry was ready.",
+                f"{self.fleet_ready_seconds:.3f}")
+        add("guardian_cpu_seconds", "counter", "CPU time used by the guardian itself.", f"{sum(os.times()[:2]):.3f}")
+        
+        phase_lines = ["# TYPE guardian_phase_seconds histogram",
+                       "# HELP guardian_phase_seconds Duration of each phase of the monitoring cycle."]
+        for name, h in sorted(timings.phases.items()):
+            cumulative = 0
+            for bucket, n in enumerate(h.counts):
+                cumulative += n
+                le = "+Inf" if bucket == h.BUCKETS - 1 else f"{h.bound(bucket):g}"
+                phase_lines.append(f'guardian_phase_seconds_bucket{{phase="{name}",le="{le}"}} {cumulative}')
+            phase_lines.append(f'guardian_phase_seconds_count{{phase="{name}"}} {h.count}')
+            phase_lines.append(f'guardian_phase_seconds_sum{{phase="{name}"}} {h.total:.6f}')
+        families["guardian_phase_seconds"] = phase_lines
+        
+        lines = [line for family in families.values() for line in family]
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        """Flushes pending writes; call once on exit"""
+        if self.exporter is not None: self.exporter.close()
+        if self.control is not None: self.control.close()
+        self.flush_config()
+        if timings.phases:
+            logging.info(f"Phase timings: {timings.summary_text()}")
+        with self.journal.lock:
+            self.journal.compact({proc["id"] for proc in self.processes})
+        self.journal.close()
+        self.events.close()
+
+class SamplingProfiler:
+    """Opt-in wall-clock profiler: samples every thread's stack and writes folded stacks on stop,
+    or on demand (SIGUSR1 or the `profile` control command) while the guardian keeps running"""
+    def __init__(self, path, interval=0.005):
+        self.path = path
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.lock = threading.Lock()
+        self.dump_requested = threading.Event()  # Set from a signal handler; the sampler thread writes
+        self.labels = {}  # code object -> "func (file:line)"
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True, name="sampling-profiler")
+        self.thread.start()
+        logging.info(f"Profiling to {path} every {interval * 1000:.0f} ms")
+
+    def label(self, code):
+        text = self.labels.get(code)
+        if text is None:
+            text = self.labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return text
+
+    def run(self):
+        me = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = {t.ident: t.name.rstrip("_0123456789") for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me: continue
+                stack = []
+                while frame is not None:
+                    stack.append(self.label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, "thread"))
+                with self.lock:
+                    self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            if self.dump_requested.is_set():
+                self.dump_requested.clear()
+                self.write()
+
+    def write(self):
+        """Writes everything sampled so far; returns the sample count"""
+        with self.lock:
+            stacks, samples = self.stacks.most_common(), self.samples
+        # One "root;caller;callee count" line per stack: the input format of flamegraph.pl and speedscope
+        write_atomic(self.path, "".join(f"{stack} {count}\n" for stack, count in stacks))
+        logging.info(f"Profile written to {self.path} ({samples} samples)")
+        return samples
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.write()
+
+class HeadlessGuardian:
+    """Runs the engine without a window, for servers and services"""
+    HEARTBEAT = 60
+    HISTORY_EVERY = 3600  # Seconds between crash-history summaries in the log
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.stop_event = threading.Event()
+
+    def run(self):
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: self.stop_event.set())
+        
+        self.engine.start_all()
+        self.engine.report_startup("headless")
+        next_history = time.monotonic() + self.HISTORY_EVERY
+        while not self.stop_event.wait(self.HEARTBEAT):
+            logging.info(self.engine.status_text())
+            if time.monotonic() >= next_history:
+                next_history += self.HISTORY_EVERY
+                logging.info(self.engine.history_summary())
+        
+        self.engine.stop_all()
+        self.engine.close()
+        logging.info("Application exiting.")
+
+def load_gui():
+    """Imports tkinter on first use"""
+    global tk, ttk, messagebox, filedialog, font, scrolledtext
+    import tkinter as tk
+    from tkinter import ttk, messagebox, filedialog, font, scrolledtext
+
+class UpdateBus:
+    """Coalesces state snapshots from worker threads until the Tk loop drains them"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}  # id(proc) -> (proc, latest fields)
+        self.calls = collections.deque()  # Functions to run on the Tk thread, e.g. control API mutations
+
+    def publish(self, proc, fields):
+        with self.lock:
+            entry = self.pending.get(id(proc))
+            if entry is None:
+                self.pending[id(proc)] = (proc, dict(fields))
+            else:
+                # Only the newest value per card survives until the next frame
+                entry[1].update(fields)
+
+    def call(self, fn):
+        self.calls.append(fn)
+
+    def drain(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        return pending.values()
+
 class FloatingWidget:
     """Class to create a small floating widget when the app is minimized"""
     def __init__(self, root, restore_callback):
@@ -61,9 +2872,412 @@ class FloatingWidget:
         self.widget.destroy()
         self.restore_callback()
 
+class ProcessCard:
+    """One recycled row of the virtualized process list"""
+    def __init__(self, app, canvas):
+        self.app = app
+        self.canvas = canvas
+        self.row = None
+        self.proc = None
+        self.signature = None
+        self.window_id = None
+        
+        bg = app.card_bg
+        self.frame = tk.Frame(canvas, bg=bg, relief=tk.FLAT)
+        self.frame.pack_propagate(False)
+        
+        inner = tk.Frame(self.frame, bg=bg)
+        inner.pack(fill=tk.X, padx=15, pady=15)
+        
+        self.icon_label = tk.Label(inner, font=("Segoe UI", 24), bg=bg)
+        self.icon_label.pack(side=tk.LEFT, padx=(0, 15))
+        
+        info_frame = tk.Frame(inner, bg=bg)
+        info_frame.pack(side=tk.LEFT, fill=tk.Y)
+        
+        self.name_label = tk.Label(info_frame, font=("Segoe UI", 12, "bold"), bg=bg, fg=app.fg_color, anchor=tk.W)
+        self.name_label.pack(anchor=tk.W)
+        self.path_label = tk.Label(info_frame, font=("Segoe UI", 8), bg=bg, fg=app.fg_color, anchor=tk.W)
+        self.path_label.pack(anchor=tk.W)
+        
+        stats_frame = tk.Frame(info_frame, bg=bg)
+        stats_frame.pack(anchor=tk.W, pady=(5, 0))
+        
+        self.vars = {}
+        for key, color in (("status_var", app.warning_color), ("cpu_var", app.fg_color),
+                           ("ram_var", app.fg_color), ("restart_var", app.accent_color)):
+            var = tk.StringVar()
+            tk.Label(stats_frame, textvariable=var, font=("Segoe UI", 9), bg=bg, fg=color).pack(side=tk.LEFT, padx=(0, 10))
+            self.vars[key] = var
+        
+        # Last 5 minutes of CPU/RAM from the entry's metrics history
+        self.vars["spark_var"] = tk.StringVar()
+        tk.Label(info_frame, textvariable=self.vars["spark_var"], font=("Consolas", 8), bg=bg, fg=app.accent_color, anchor=tk.W).pack(anchor=tk.W)
+        
+        right = tk.Frame(inner, bg=bg)
+        right.pack(side=tk.RIGHT)
+        
+        self.toggle_btn = tk.Button(right, bg=app.success_color, fg="#000000", relief=tk.FLAT, padx=15, pady=8, cursor="hand2", command=self.toggle)
+        self.toggle_btn.pack(side=tk.LEFT, padx=5)
+        tk.Button(right, text="⟳", command=self.restart_tree, bg=app.accent_color, fg="#000000", relief=tk.FLAT, padx=12, pady=8, cursor="hand2").pack(side=tk.LEFT, padx=5)
+        tk.Button(right, text="✖", command=self.kill_tree, bg=app.warning_color, fg="#000000", relief=tk.FLAT, padx=12, pady=8, cursor="hand2").pack(side=tk.LEFT, padx=5)
+        tk.Button(right, text="📄", command=self.show_output, bg=app.log_color, fg="#000000", relief=tk.FLAT, padx=12, pady=8, cursor="hand2").pack(side=tk.LEFT, padx=5)
+        tk.Button(right, text="🗑", command=self.remove, bg=app.error_color, fg="#000000", relief=tk.FLAT, padx=12, pady=8, cursor="hand2").pack(side=tk.LEFT, padx=5)
+
+    def show(self, row, proc, state, y, width):
+        signature = (proc["name"], proc["path"], proc.get("args"), proc.get("icon"))
+        if proc is not self.proc or signature != self.signature:
+            self.icon_label.config(text=proc.get("icon", "🔵"))
+            self.name_label.config(text=proc["name"])
+            args_display = f"Args: {proc.get('args')}" if proc.get('args') else ""
+            self.path_label.config(text=f"{proc['path']} {args_display}")
+            self.signature = signature
+        self.row, self.proc = row, proc
+        
+        for key, text in state.items():
+            self.set_text(key, text)
+        self.update_toggle()
+        
+        height = self.app.CARD_HEIGHT - 10
+        if self.window_id is None:
+            self.window_id = self.canvas.create_window(5, y, window=self.frame, anchor="nw", width=width, height=height)
+        else:
+            self.canvas.coords(self.window_id, 5, y)
+            self.canvas.itemconfigure(self.window_id, width=width)
+
+    def hide(self):
+        if self.window_id is not None:
+            self.canvas.delete(self.window_id)
+            self.window_id = None
+        self.proc = None
+
+    def set_text(self, key, text):
+        var = self.vars[key]
+        # Skip unchanged values so a steady fleet causes no repaints
+        if var.get() != text:
+            var.set(text)
+
+    def update_toggle(self):
+        # Logic to determine button state based on running status
+        is_running = self.proc.get("monitoring", False)
+        policy = self.proc.get("policy")
+        if is_running and policy is not None and policy.quarantined:
+            btn_text, color = "↻ Retry", self.app.warning_color
+        elif is_running:
+            btn_text, color = "⏸ Stop", self.app.error_color
+        else:
+            btn_text, color = "▶ Start", self.app.success_color
+        if self.toggle_btn.cget("text") != btn_text:
+            self.toggle_btn.config(text=btn_text, bg=color)
+
+    def toggle(self):
+        policy = self.proc.get("policy")
+        if self.proc.get("monitoring") and policy is not None and policy.quarantined:
+            self.app.engine.release(self.proc)
+            self.update_toggle()
+        elif self.proc.get("monitoring"): self.app.stop_monitoring_process(self.proc)
+        else: self.app.start_monitoring_process(self.proc)
+
+    def restart_tree(self):
+        if messagebox.askyesno("Restart", f"Restart {self.proc['name']} and every process it started?"):
+            self.app.engine.restart_tree(self.proc)
+
+    def kill_tree(self):
+        if messagebox.askyesno("Terminate", f"Stop monitoring {self.proc['name']} and terminate its whole process tree?"):
+            self.app.engine.kill_tree(self.proc)
+            self.app.update_card_toggle(self.proc)
+            self.app.update_status()
+
+    def show_output(self):
+        OutputViewer(self.app, self.proc)
+
+    def remove(self):
+        self.app.remove_process(self.proc)
+
+class LogViewer:
+    """Event log viewer that pages backwards from the end of the file and follows new lines"""
+    CHUNK_BYTES = 64 * 1024
+    PAGE_LINES = 500
+    MAX_SCAN_BYTES = 4 * 1024 * 1024  # Per page, so a rarely matching filter never stalls the UI
+    MAX_LINES = 5000  # Lines kept in the widget while following the tail
+    TAIL_MS = 1000
+    LEVELS = ("ALL", "INFO", "WARNING", "ERROR")
+
+    def __init__(self, app, path=LOG_FILE):
+        self.path = path
+        self.dialog = tk.Toplevel(app.root)
+        self.dialog.title("Event Logs")
+        self.dialog.geometry("700x450")
+        self.dialog.configure(bg=app.bg_color)
+        self.dialog.attributes('-topmost', True)
+        
+        # Filter bar
+        bar = tk.Frame(self.dialog, bg=app.bg_color)
+        bar.pack(fill=tk.X, padx=10, pady=(10, 0))
+        
+        tk.Label(bar, text="Process:", bg=app.bg_color, fg=app.fg_color).pack(side=tk.LEFT)
+        self.name_var = tk.StringVar()
+        name_entry = tk.Entry(bar, textvariable=self.name_var, width=20, bg=app.card_bg, fg=app.fg_color, insertbackground=app.fg_color)
+        name_entry.pack(side=tk.LEFT, padx=5)
+        name_entry.bind("<KeyRelease>", self.schedule_reload)
+        
+        tk.Label(bar, text="Level:", bg=app.bg_color, fg=app.fg_color).pack(side=tk.LEFT, padx=(10, 0))
+        self.level_var = tk.StringVar(value="ALL")
+        level_box = ttk.Combobox(bar, textvariable=self.level_var, values=self.LEVELS, width=9, state="readonly")
+        level_box.pack(side=tk.LEFT, padx=5)
+        level_box.bind("<<ComboboxSelected>>", self.schedule_reload)
+        
+        self.follow_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(bar, text="Follow", variable=self.follow_var, bg=app.bg_color, fg=app.fg_color,
+                       selectcolor=app.card_bg, activebackground=app.bg_color).pack(side=tk.LEFT, padx=10)
+        tk.Button(bar, text="⬆ Older", command=self.load_older, bg=app.accent_color, fg="#000000", relief=tk.FLAT, cursor="hand2").pack(side=tk.RIGHT)
+        
+        self.text = scrolledtext.ScrolledText(self.dialog, width=80, height=20, font=("Consolas", 9), bg=app.card_bg, fg=app.fg_color)
+        self.text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.text.configure(yscrollcommand=self.on_yscroll, state='disabled')
+        
+        self.status_label = tk.Label(self.dialog, font=("Segoe UI", 8), bg=app.bg_color, fg=app.fg_color, anchor=tk.W)
+        self.status_label.pack(fill=tk.X, padx=10, pady=(0, 8))
+        
+        # offsets[i] is the file position of the i-th displayed line
+        self.offsets = collections.deque()
+        self.top_offset = self.end_offset = 0
+        self.file_id = None
+        self.reload_job = self.older_job = None
+        
+        self.reload()
+        self.tail_job = self.dialog.after(self.TAIL_MS, self.tail)
+        self.dialog.protocol("WM_DELETE_WINDOW", self.close)
+
+    def matches(self, line):
+        level = self.level_var.get()
+        if level != "ALL" and f" - {level} - " not in line:
+            return False
+        name = self.name_var.get().strip().lower()
+        return not name or name in line.lower()
+
+    def split_lines(self, data, base):
+        """Yields (offset, line) for every complete, matching line in data read from position base"""
+        pos = base
+        for raw in data.split(b"\n"):
+            if raw:
+                line = raw.decode('utf-8', 'replace').rstrip('\r')
+                if self.matches(line):
+                    yield pos, line
+            pos += len(raw) + 1
+
+    def schedule_reload(self, *_):
+        if self.reload_job:
+            self.dialog.after_cancel(self.reload_job)
+        self.reload_job = self.dialog.after(300, self.reload)
+
+    def reload(self):
+        self.reload_job = None
+        self.offsets.clear()
+        self.text.configure(state='normal')
+        self.text.delete("1.0", tk.END)
+        self.text.configure(state='disabled')
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            self.file_id = None
+            self.top_offset = self.end_offset = 0
+            self.status_label.config(text="No logs found yet.")
+            return
+        
+        self.file_id = st.st_ino
+        # Start at the last complete line; a half-written one is picked up by the tail
+        with open(self.path, 'rb') as f:
+            f.seek(max(0, st.st_size - self.CHUNK_BYTES))
+            data = f.read()
+        self.top_offset = self.end_offset = st.st_size - len(data) + data.rfind(b"\n") + 1
+        self.load_older()
+        self.text.see(tk.END)
+
+    def load_older(self):
+        self.older_job = None
+        if self.top_offset <= 0:
+            return
+        items = []
+        scanned = 0
+        try:
+            with open(self.path, 'rb') as f:
+                while self.top_offset > 0 and len(items) < self.PAGE_LINES and scanned < self.MAX_SCAN_BYTES:
+                    start = max(0, self.top_offset - self.CHUNK_BYTES)
+                    f.seek(start)
+                    data = f.read(self.top_offset - start)
+                    # Drop the partial first line unless we reached the start of the file
+                    if start > 0:
+                        cut = data.find(b"\n")
+                        if cut == -1:
+                            data = b""  # Inside one huge line: skip this piece rather than read it whole
+                        else:
+                            data = data[cut + 1:]
+                            start += cut + 1
+                    scanned += self.top_offset - start
+                    items[:0] = list(self.split_lines(data, start))
+                    self.top_offset = start
+        except OSError as e:
+            self.status_label.config(text=f"Error reading logs: {e}")
+            return
+        
+        if items:
+            first_line = int(self.text.index("@0,0").split(".")[0])
+            self.text.configure(state='normal')
+            self.text.insert("1.0", "".join(line + "\n" for _, line in items))
+            self.text.configure(state='disabled')
+            self.offsets.extendleft(offset for offset, _ in reversed(items))
+            # Keep the line the user was looking at in view
+            self.text.see(f"{first_line + len(items)}.0")
+        self.update_status()
+
+    def on_yscroll(self, first, last):
+        self.text.vbar.set(first, last)
+        # Scrolling to the top pulls in the previous page
+        if float(first) <= 0.0 and self.top_offset > 0 and self.older_job is None:
+            self.older_job = self.dialog.after_idle(self.load_older)
+
+    def tail(self):
+        self.tail_job = self.dialog.after(self.TAIL_MS, self.tail)
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return
+        if st.st_ino != self.file_id or st.st_size < self.end_offset:
+            # The log was rotated or truncated: start over on the new file
+            self.reload()
+            return
+        if st.st_size == self.end_offset:
+            return
+        
+        with open(self.path, 'rb') as f:
+            f.seek(self.end_offset)
+            data = f.read(min(st.st_size - self.end_offset, self.MAX_SCAN_BYTES))
+        cut = data.rfind(b"\n")
+        if cut == -1:
+            return
+        data = data[:cut + 1]
+        items = list(self.split_lines(data, self.end_offset))
+        self.end_offset += len(data)
+        if not items:
+            return
+        
+        at_bottom = self.text.yview()[1] >= 0.999
+        self.text.configure(state='normal')
+        self.text.insert(tk.END, "".join(line + "\n" for _, line in items))
+        self.offsets.extend(offset for offset, _ in items)
+        # While following, drop the oldest lines so the widget stays bounded
+        excess = len(self.offsets) - self.MAX_LINES
+        if self.follow_var.get() and at_bottom and excess > 0:
+            self.text.delete("1.0", f"{excess + 1}.0")
+            for _ in range(excess):
+                self.offsets.popleft()
+            self.top_offset = self.offsets[0]
+        self.text.configure(state='disabled')
+        if self.follow_var.get() and at_bottom:
+            self.text.see(tk.END)
+        self.update_status()
+
+    def update_status(self):
+        text = f"{len(self.offsets)} lines shown  |  {self.end_offset / 1024:.0f} KB log"
+        if self.top_offset > 0:
+            text += f"  |  {self.top_offset / 1024:.0f} KB older (scroll up or press Older)"
+        self.status_label.config(text=text)
+
+    def close(self):
+        for job in (self.tail_job, self.reload_job, self.older_job):
+            if job:
+                self.dialog.after_cancel(job)
+        self.dialog.destroy()
+
+class OutputViewer:
+    """Live tail of an entry's captured output, and the output saved with its last crash"""
+    REFRESH_MS = 1000
+
+    def __init__(self, app, proc):
+        self.engine = app.engine
+        self.proc = proc
+        self.dialog = tk.Toplevel(app.root)
+        self.dialog.title(f"Output - {proc['name']}")
+        self.dialog.geometry("760x450")
+        self.dialog.configure(bg=app.bg_color)
+        self.dialog.attributes('-topmost', True)
+        
+        bar = tk.Frame(self.dialog, bg=app.bg_color)
+        bar.pack(fill=tk.X, padx=10, pady=(10, 0))
+        self.crash_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(bar, text="Last crash", variable=self.crash_var, command=self.reload, bg=app.bg_color, fg=app.fg_color,
+                       selectcolor=app.card_bg, activebackground=app.bg_color).pack(side=tk.LEFT)
+        
+        self.text = scrolledtext.ScrolledText(self.dialog, width=90, height=20, font=("Consolas", 9), bg=app.card_bg, fg=app.fg_color)
+        self.text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.shown = None
+        self.reload()
+        self.dialog.after(self.REFRESH_MS, self.follow)
+
+    def reload(self):
+        if self.crash_var.get():
+            data = self.engine.events.attachment(self.proc["id"])
+            text = data.decode('utf-8', 'replace') if data is not None else "(no crash output saved)"
+        else:
+            text = self.engine.capture.text(self.proc)
+            if not text and not self.engine.captures(self.proc):
+                text = "(output capture is off for this entry; set \"capture_output\": true)"
+        # Only repaint when something changed, and keep the view at the end while following
+        if text != self.shown:
+            self.shown = text
+            self.text.configure(state='normal')
+            self.text.delete('1.0', tk.END)
+            self.text.insert(tk.END, text)
+            self.text.configure(state='disabled')
+            self.text.see(tk.END)
+
+    def follow(self):
+        if not self.dialog.winfo_exists(): return
+        if not self.crash_var.get(): self.reload()
+        self.dialog.after(self.REFRESH_MS, self.follow)
+
+class HistoryViewer:
+    """Crash/restart history per entry over a chosen window, straight from the event index"""
+    WINDOWS = {"24 hours": 1, "7 days": 7, "30 days": 30}
+
+    def __init__(self, app):
+        self.engine = app.engine
+        self.dialog = tk.Toplevel(app.root)
+        self.dialog.title("Crash History")
+        self.dialog.geometry("760x450")
+        self.dialog.configure(bg=app.bg_color)
+        self.dialog.attributes('-topmost', True)
+        
+        bar = tk.Frame(self.dialog, bg=app.bg_color)
+        bar.pack(fill=tk.X, padx=10, pady=(10, 0))
+        tk.Label(bar, text="Window:", bg=app.bg_color, fg=app.fg_color).pack(side=tk.LEFT)
+        self.window_var = tk.StringVar(value="7 days")
+        window_box = ttk.Combobox(bar, textvariable=self.window_var, values=list(self.WINDOWS), width=9, state="readonly")
+        window_box.pack(side=tk.LEFT, padx=5)
+        window_box.bind("<<ComboboxSelected>>", self.reload)
+        tk.Button(bar, text="⟳ Refresh", command=self.reload, bg=app.accent_color, fg="#000000", relief=tk.FLAT, cursor="hand2").pack(side=tk.RIGHT)
+        
+        self.text = scrolledtext.ScrolledText(self.dialog, width=90, height=20, font=("Consolas", 9), bg=app.card_bg, fg=app.fg_color)
+        self.text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.reload()
+
+    def reload(self, *_):
+        report = self.engine.history(self.WINDOWS[self.window_var.get()])
+        self.text.configure(state='normal')
+        self.text.delete('1.0', tk.END)
+        self.text.insert(tk.END, history_text(report))
+        self.text.configure(state='disabled')
+
 class ModernProcessMonitor:
-    def __init__(self, root):
+    FRAME_MS = 200  # Dashboard refresh rate for monitor updates
+    SPARK_MS = 2000  # Sparklines are only rebuilt for visible cards, at this rate
+    SPARK_SECONDS = 300
+    CARD_HEIGHT = 115  # Fixed row height lets the list compute visible rows without measuring widgets
+
+    def __init__(self, root, engine):
         self.root = root
+        self.engine = engine
         self.root.title("Process Guardian - Ultimate Edition")
         self.root.geometry("800x550") 
         self.root.resizable(True, False)
@@ -87,16 +3301,26 @@ class ModernProcessMonitor:
         
         # Application variables
         self.monitoring = False
-        self.monitor_threads = {}
-        self.processes = []
-        self.config_file = "guardian_config.json"
+        self.processes = engine.processes
         self.floating_widget = None
         
-        # Load previous settings
-        self.load_config()
+        # Virtualized list state: row -> card for visible rows, plus the last text per entry
+        self.cards = {}
+        self.spare_cards = []
+        self.visible_cards = {}
+        self.card_state = {}
+        self.render_pending = False
+        
+        # Worker threads never touch Tk; they publish to the bus and the mainloop drains it
+        self.update_bus = UpdateBus()
+        engine.listener = self.update_bus.publish
+        engine.owner = self.update_bus.call
         
         # Create GUI
         self.create_modern_widgets()
+        self.root.after_idle(lambda: self.engine.report_startup("gui"))
+        self.root.after(self.FRAME_MS, self.drain_updates)
+        self.root.after(self.SPARK_MS, self.refresh_sparklines)
         
         # Handle window closing
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -153,6 +3377,7 @@ class ModernProcessMonitor:
         self.create_btn(inner_control, "➕ Add", self.add_process_dialog, self.accent_color, header_font)
         self.create_btn(inner_control, "💾 Save", self.manual_save_config, self.save_color, header_font)
         self.create_btn(inner_control, "📋 Logs", self.show_logs_dialog, self.log_color, header_font)
+        self.create_btn(inner_control, "📈 History", self.show_history_dialog, self.info_color, header_font)
         self.start_all_btn = self.create_btn(inner_control, "▶ Start All", self.start_all_monitoring, self.success_color, header_font)
         self.stop_all_btn = self.create_btn(inner_control, "⏸ Stop All", self.stop_all_monitoring, self.error_color, header_font, state=tk.DISABLED)
         
@@ -175,47 +3400,35 @@ class ModernProcessMonitor:
         list_container = tk.Frame(main_container, bg=self.bg_color)
         list_container.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
         
+        # Cards are laid out on the canvas directly so only visible rows need widgets
         canvas = tk.Canvas(list_container, bg=self.bg_color, highlightthickness=0)
-        scrollbar = ttk.Scrollbar(list_container, orient="vertical", command=canvas.yview)
-        self.process_list_frame = tk.Frame(canvas, bg=self.bg_color)
+        self.list_canvas = canvas
+        self.list_scrollbar = ttk.Scrollbar(list_container, orient="vertical", command=canvas.yview)
+        canvas.configure(yscrollcommand=self.on_list_scroll)
+        canvas.bind("<Configure>", self.on_list_resize)
         
-        self.process_list_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        canvas.create_window((0, 0), window=self.process_list_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        empty_label = tk.Label(canvas, text="No processes. Click 'Add' to start.", font=("Segoe UI", 11), bg=self.bg_color, fg=self.fg_color)
+        self.empty_window = canvas.create_window(0, 50, window=empty_label, anchor="n", state=tk.HIDDEN)
         
         canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.list_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         self.refresh_process_list()
+        self.refresh_status_loop()
 
-    def create_btn(self, parent, text, cmd, bg, font, state=tk.NORMAL):
+    def create_btn(self, parent, text, cmd, bg, font, state="normal"):
         btn = tk.Button(parent, text=text, command=cmd, bg=bg, fg="#000000", font=font, relief=tk.FLAT, padx=12, pady=8, cursor="hand2", state=state)
         btn.pack(side=tk.LEFT, padx=3)
         return btn
 
     def show_logs_dialog(self):
-        dialog = tk.Toplevel(self.root)
-        dialog.title("Event Logs")
-        dialog.geometry("600x400")
-        dialog.configure(bg=self.bg_color)
-        dialog.attributes('-topmost', True)
-        
-        log_area = scrolledtext.ScrolledText(dialog, width=70, height=20, font=("Consolas", 9), bg=self.card_bg, fg=self.fg_color)
-        log_area.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
-        try:
-            if os.path.exists('guardian_events.log'):
-                with open('guardian_events.log', 'r') as f:
-                    log_area.insert(tk.END, f.read())
-            else:
-                log_area.insert(tk.END, "No logs found yet.")
-        except Exception as e:
-            log_area.insert(tk.END, f"Error reading logs: {e}")
-            
-        log_area.configure(state='disabled')
+        LogViewer(self)
+
+    def show_history_dialog(self):
+        HistoryViewer(self)
 
     def manual_save_config(self):
-        self.save_config()
+        self.engine.flush_config()
         messagebox.showinfo("Saved", "Configuration saved successfully!")
 
     def show_about_dialog(self):
@@ -246,7 +3459,7 @@ class ModernProcessMonitor:
     def add_process_dialog(self):
         dialog = tk.Toplevel(self.root)
         dialog.title("Add New Process")
-        dialog.geometry("550x400")
+        dialog.geometry("550x460")
         dialog.configure(bg=self.bg_color)
         dialog.attributes('-topmost', True)
         dialog.transient(self.root)
@@ -283,10 +3496,19 @@ class ModernProcessMonitor:
         
         icon_var, _ = create_row("Icon (emoji):", 4)
         icon_var.set("🔵")
+        capture_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(frame, text="Capture output", variable=capture_var, bg=self.bg_color, fg=self.fg_color, selectcolor=self.card_bg,
+                       activebackground=self.bg_color).grid(row=4, column=2, padx=5)
         
         tk.Label(frame, text="Check Interval (sec):", bg=self.bg_color, fg=self.fg_color).grid(row=5, column=0, sticky=tk.W, pady=5)
         interval_var = tk.IntVar(value=5)
         tk.Spinbox(frame, from_=1, to=60, textvariable=interval_var, width=38, bg=self.card_bg, fg=self.fg_color).grid(row=5, column=1, padx=5, pady=5)
+        adaptive_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(frame, text="Adaptive", variable=adaptive_var, bg=self.bg_color, fg=self.fg_color, selectcolor=self.card_bg,
+                       activebackground=self.bg_color).grid(row=5, column=2, padx=5)
+        
+        probe_var, _ = create_row("Health Probe (Optional):", 6)
+        tk.Label(frame, text="(tcp://127.0.0.1:8080, http://localhost:8080/health or a command)", font=("Segoe UI", 7), bg=self.bg_color, fg=self.warning_color).grid(row=7, column=1, sticky=tk.W)
         
         def save():
             path = path_var.get()
@@ -304,188 +3526,165 @@ class ModernProcessMonitor:
                 "args": args_var.get(),
                 "icon": icon_var.get(),
                 "interval": interval_var.get(),
-                "enabled": True,
-                "restart_count": 0
+                "enabled": True
             }
-            self.processes.append(process_info)
-            self.save_config()
+            if adaptive_var.get():
+                process_info["adaptive"] = True  # Relaxes up to max_interval (60 s) while stable
+            if capture_var.get():
+                process_info["capture_output"] = True
+            probe = parse_probe(probe_var.get())
+            if probe:
+                problem = probe_problem(probe)
+                if problem:
+                    messagebox.showerror("Error", problem)
+                    return
+                process_info["probe"] = probe
+            self.engine.add_process(process_info)
             self.refresh_process_list()
             logging.info(f"Added new process configuration: {name}")
             dialog.destroy()
         
         btn_frame = tk.Frame(frame, bg=self.bg_color)
-        btn_frame.grid(row=6, column=0, columnspan=3, pady=20)
+        btn_frame.grid(row=8, column=0, columnspan=3, pady=20)
         tk.Button(btn_frame, text="Add Process", command=save, bg=self.success_color, fg="#000000", relief=tk.FLAT, padx=20, pady=8, cursor="hand2").pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="Cancel", command=dialog.destroy, bg=self.error_color, fg="#000000", relief=tk.FLAT, padx=20, pady=8, cursor="hand2").pack(side=tk.LEFT, padx=5)
 
     def refresh_process_list(self):
-        for widget in self.process_list_frame.winfo_children():
-            widget.destroy()
-        if not self.processes:
-            tk.Label(self.process_list_frame, text="No processes. Click 'Add' to start.", font=("Segoe UI", 11), bg=self.bg_color, fg=self.fg_color).pack(pady=50)
-            return
-        for idx, proc in enumerate(self.processes):
-            self.create_process_card(idx, proc)
+        """Re-syncs the list with self.processes; only cards whose row changed are rebound"""
+        total = len(self.processes)
+        canvas = self.list_canvas
+        canvas.configure(scrollregion=(0, 0, canvas.winfo_width(), total * self.CARD_HEIGHT))
+        canvas.itemconfigure(self.empty_window, state=tk.HIDDEN if total else tk.NORMAL)
+        
+        live = {id(proc) for proc in self.processes}
+        for key in [key for key in self.card_state if key not in live]:
+            del self.card_state[key]
+        self.render_visible_cards()
 
-    def create_process_card(self, idx, proc):
-        card = tk.Frame(self.process_list_frame, bg=self.card_bg, relief=tk.FLAT)
-        card.pack(fill=tk.X, pady=5, padx=5)
-        
-        inner = tk.Frame(card, bg=self.card_bg)
-        inner.pack(fill=tk.X, padx=15, pady=15)
-        
-        tk.Label(inner, text=proc.get("icon", "🔵"), font=("Segoe UI", 24), bg=self.card_bg).pack(side=tk.LEFT, padx=(0, 15))
-        
-        info_frame = tk.Frame(inner, bg=self.card_bg)
-        info_frame.pack(side=tk.LEFT, fill=tk.Y)
-        
-        tk.Label(info_frame, text=proc["name"], font=("Segoe UI", 12, "bold"), bg=self.card_bg, fg=self.fg_color, anchor=tk.W).pack(anchor=tk.W)
-        
-        args_display = f"Args: {proc.get('args')}" if proc.get('args') else ""
-        tk.Label(info_frame, text=f"{proc['path']} {args_display}", font=("Segoe UI", 8), bg=self.card_bg, fg=self.fg_color, anchor=tk.W).pack(anchor=tk.W)
-        
-        stats_frame = tk.Frame(info_frame, bg=self.card_bg)
-        stats_frame.pack(anchor=tk.W, pady=(5, 0))
-        
-        status_var = tk.StringVar(value="⚫ Not Running")
-        tk.Label(stats_frame, textvariable=status_var, font=("Segoe UI", 9), bg=self.card_bg, fg=self.warning_color).pack(side=tk.LEFT, padx=(0, 10))
-        
-        cpu_var = tk.StringVar(value="CPU: 0%")
-        tk.Label(stats_frame, textvariable=cpu_var, font=("Segoe UI", 9), bg=self.card_bg, fg=self.fg_color).pack(side=tk.LEFT, padx=(0, 10))
-        
-        ram_var = tk.StringVar(value="RAM: 0 MB")
-        tk.Label(stats_frame, textvariable=ram_var, font=("Segoe UI", 9), bg=self.card_bg, fg=self.fg_color).pack(side=tk.LEFT, padx=(0, 10))
-        
-        # Added Restart Count Label
-        restart_var = tk.StringVar(value=f"Restarts: {proc.get('restart_count', 0)}")
-        tk.Label(stats_frame, textvariable=restart_var, font=("Segoe UI", 9), bg=self.card_bg, fg=self.accent_color).pack(side=tk.LEFT)
-        
-        proc["status_var"] = status_var
-        proc["cpu_var"] = cpu_var
-        proc["ram_var"] = ram_var
-        proc["restart_var"] = restart_var
-        
-        right = tk.Frame(inner, bg=self.card_bg)
-        right.pack(side=tk.RIGHT)
-        
-        def toggle():
-            if idx in self.monitor_threads: self.stop_monitoring_process(idx)
-            else: self.start_monitoring_process(idx)
-            
-        # Logic to determine button state based on running status
-        is_running = idx in self.monitor_threads
-        btn_text = "⏸ Stop" if is_running else "▶ Start"
-        btn_color = self.error_color if is_running else self.success_color
+    def schedule_render(self, *_):
+        if not self.render_pending:
+            self.render_pending = True
+            self.root.after_idle(self.render_visible_cards)
 
-        toggle_btn = tk.Button(right, text=btn_text, bg=btn_color, fg="#000000", relief=tk.FLAT, padx=15, pady=8, cursor="hand2", command=toggle)
-        toggle_btn.pack(side=tk.LEFT, padx=5)
-        proc["toggle_btn"] = toggle_btn
-        
-        def remove():
-            if idx in self.monitor_threads: self.stop_monitoring_process(idx)
-            self.processes.pop(idx)
-            self.save_config()
-            self.refresh_process_list()
-            
-        tk.Button(right, text="🗑", command=remove, bg=self.error_color, fg="#000000", relief=tk.FLAT, padx=12, pady=8, cursor="hand2").pack(side=tk.LEFT, padx=5)
+    def render_visible_cards(self):
+        """Only rows inside the viewport exist as widgets; cards scrolled out are recycled"""
+        self.render_pending = False
+        canvas = self.list_canvas
+        procs = list(self.processes)
+        total = len(procs)
+        top = canvas.canvasy(0)
+        first = max(0, int(top // self.CARD_HEIGHT) - 1)
+        last = min(total, int((top + canvas.winfo_height()) // self.CARD_HEIGHT) + 2)
+        width = max(canvas.winfo_width() - 10, 100)
+        
+        for row in [row for row in self.cards if not first <= row < last]:
+            card = self.cards.pop(row)
+            card.hide()
+            self.spare_cards.append(card)
+        
+        for row in range(first, last):
+            card = self.cards.get(row)
+            if card is None:
+                card = self.spare_cards.pop() if self.spare_cards else ProcessCard(self, canvas)
+                self.cards[row] = card
+            proc = procs[row]
+            card.show(row, proc, self.card_state_for(proc), row * self.CARD_HEIGHT + 5, width)
+        
+        self.visible_cards = {id(card.proc): card for card in self.cards.values()}
 
-    def start_monitoring_process(self, idx):
-        if idx >= len(self.processes): return
-        proc = self.processes[idx]
-        proc["monitoring"] = True
-        thread = threading.Thread(target=self.monitor_process, args=(idx,), daemon=True)
-        thread.start()
-        self.monitor_threads[idx] = thread
-        # No need to update button here manually, refresh list handles it or next loop
-        # But to be responsive, we update:
-        if "toggle_btn" in proc: proc["toggle_btn"].config(text="⏸ Stop", bg=self.error_color)
+    def on_list_scroll(self, first, last):
+        self.list_scrollbar.set(first, last)
+        self.schedule_render()
+
+    def on_list_resize(self, event):
+        canvas = self.list_canvas
+        canvas.coords(self.empty_window, event.width // 2, 50)
+        canvas.configure(scrollregion=(0, 0, event.width, len(self.processes) * self.CARD_HEIGHT))
+        self.schedule_render()
+
+    def card_state_for(self, proc):
+        state = self.card_state.get(id(proc))
+        if state is None:
+            state = self.card_state[id(proc)] = {
+                "status_var": "⚫ Not Running",
+                "cpu_var": "CPU: 0%",
+                "ram_var": "RAM: 0 MB",
+                "restart_var": f"Restarts: {proc.get('restart_count', 0)}",
+                "spark_var": "",
+            }
+        return state
+
+    def remove_process(self, proc):
+        if proc not in self.processes: return
+        if proc.get("monitoring"): self.stop_monitoring_process(proc)
+        self.engine.remove_process(proc)
+        self.refresh_process_list()
+
+    def start_monitoring_process(self, proc):
+        if proc not in self.processes: return
+        if not self.engine.start_monitoring(proc): return
+        self.update_card_toggle(proc)
         self.update_status()
-        logging.info(f"Started monitoring: {proc['name']}")
 
-    def stop_monitoring_process(self, idx):
-        if idx >= len(self.processes): return
-        proc = self.processes[idx]
-        proc["monitoring"] = False
-        if idx in self.monitor_threads: del self.monitor_threads[idx]
-        if "toggle_btn" in proc: proc["toggle_btn"].config(text="▶ Start", bg=self.success_color)
-        
-        if "status_var" in proc: proc["status_var"].set("⚫ Stopped")
-        if "cpu_var" in proc: proc["cpu_var"].set("CPU: 0%")
-        if "ram_var" in proc: proc["ram_var"].set("RAM: 0 MB")
-            
+    def stop_monitoring_process(self, proc):
+        if proc not in self.processes: return
+        self.engine.stop_monitoring(proc)
+        self.update_card_toggle(proc)
         self.update_status()
-        logging.info(f"Stopped monitoring: {proc['name']}")
 
-    def monitor_process(self, idx):
-        proc = self.processes[idx]
-        
-        while proc.get("monitoring", False):
-            try:
-                found_process = None
-                for p in psutil.process_iter(['name', 'cpu_percent', 'memory_info', 'status']):
-                    try:
-                        if p.info['name'].lower() == proc["name"].lower():
-                            found_process = p
-                            break
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        continue
-                
-                if found_process:
-                    status = found_process.info['status']
-                    cpu = found_process.cpu_percent(interval=0.1)
-                    ram = found_process.memory_info().rss / 1024 / 1024
-                    
-                    if "cpu_var" in proc: proc["cpu_var"].set(f"CPU: {cpu:.1f}%")
-                    if "ram_var" in proc: proc["ram_var"].set(f"RAM: {ram:.1f} MB")
-                    
-                    # Smart Crash Detection
-                    if status in [psutil.STATUS_ZOMBIE, psutil.STATUS_DEAD]:
-                        logging.warning(f"Process {proc['name']} is detected as {status}. Restarting...")
-                        if "status_var" in proc: proc["status_var"].set(f"⚠️ {status.title()}")
-                        try:
-                            found_process.terminate()
-                        except: pass
-                        time.sleep(1)
-                        self.start_process(idx)
-                    else:
-                         if "status_var" in proc: proc["status_var"].set("🟢 Running")
-                else:
-                    if "status_var" in proc: proc["status_var"].set("🔴 Crashed/Closed")
-                    logging.warning(f"Process {proc['name']} not found. Restarting...")
-                    self.start_process(idx)
-                
-                time.sleep(proc.get("interval", 5))
-                
-            except Exception as e:
-                logging.error(f"Monitor Error {proc['name']}: {str(e)}")
-                time.sleep(proc.get("interval", 5))
+    def update_card_toggle(self, proc):
+        card = self.visible_cards.get(id(proc))
+        if card is not None and card.proc is proc:
+            card.update_toggle()
 
-    def start_process(self, idx):
-        proc = self.processes[idx]
-        try:
-            # --- Security Fix Here: No Shell=True ---
-            cmd = [proc["path"]]
-            if proc.get("args"):
-                # Parse string args into list safely
-                cmd.extend(shlex.split(proc["args"]))
-            
-            # Set cwd to the executable's folder to prevent path errors
-            process_dir = os.path.dirname(proc["path"])
-            
-            subprocess.Popen(cmd, shell=False, cwd=process_dir)
-            
-            proc["restart_count"] = proc.get("restart_count", 0) + 1
-            if "restart_var" in proc: proc["restart_var"].set(f"Restarts: {proc['restart_count']}")
-            
-            self.save_config()
-            logging.info(f"Process restarted: {proc['name']} (Count: {proc['restart_count']})")
-            
-        except Exception as e:
-            logging.error(f"Failed to start {proc['name']}: {str(e)}")
+    def drain_updates(self):
+        calls = self.update_bus.calls
+        while calls:
+            calls.popleft()()
+        updates = self.update_bus.drain()
+        if updates:
+            with timings.phase("ui"):
+                for proc, fields in updates:
+                    self.apply_update(proc, fields)
+        self.root.after(self.FRAME_MS, self.drain_updates)
+
+    def refresh_sparklines(self):
+        for card in list(self.visible_cards.values()):
+            history = card.proc.get("history") if card.proc else None
+            if history is None:
+                continue
+            points = history.last(self.SPARK_SECONDS)
+            cpu = [p[1] for p in points]
+            ram = [p[2] for p in points]
+            text = ""
+            if points:
+                text = f"CPU 5m {sparkline(cpu)} max {max(cpu):.0f}%   RAM 5m {sparkline(ram)} max {max(ram):.0f} MB"
+            self.card_state_for(card.proc)["spark_var"] = text
+            card.set_text("spark_var", text)
+        self.root.after(self.SPARK_MS, self.refresh_sparklines)
+
+    def apply_update(self, proc, fields):
+        if "listed" in fields:
+            self.refresh_process_list()  # Entry added or removed through the control API
+            if not fields["listed"]: return
+        texts = {}
+        if "status" in fields: texts["status_var"] = fields["status"]
+        if "cpu" in fields: texts["cpu_var"] = f"CPU: {fields['cpu']:.1f}%"
+        if "ram" in fields: texts["ram_var"] = f"RAM: {fields['ram']:.1f} MB"
+        if "restarts" in fields: texts["restart_var"] = f"Restarts: {fields['restarts']}"
+        
+        state = self.card_state_for(proc)
+        state.update(texts)
+        # Off-screen entries only update their cached text; the card picks it up when scrolled in
+        card = self.visible_cards.get(id(proc))
+        if card is not None and card.proc is proc:
+            for key, text in texts.items():
+                card.set_text(key, text)
+            card.update_toggle()
 
     def start_all_monitoring(self):
-        for idx in range(len(self.processes)):
-            if idx not in self.monitor_threads: self.start_monitoring_process(idx)
+        # The engine's startup planner brings entries up in dependency order over the next moments
+        self.engine.start_all()
         
         # Refresh the UI list to update all button states at once
         self.refresh_process_list()
@@ -494,7 +3693,7 @@ class ModernProcessMonitor:
         self.stop_all_btn.config(state=tk.NORMAL)
 
     def stop_all_monitoring(self):
-        for idx in list(self.monitor_threads.keys()): self.stop_monitoring_process(idx)
+        self.engine.stop_all()
         
         # Refresh the UI list to update all button states at once
         self.refresh_process_list()
@@ -506,9 +3705,11 @@ class ModernProcessMonitor:
         self.start_all_monitoring()
 
     def update_status(self):
-        active = len(self.monitor_threads)
-        total = len(self.processes)
-        self.status_label.config(text=f"Monitoring {active} of {total} processes")
+        self.status_label.config(text=self.engine.status_text())
+
+    def refresh_status_loop(self):
+        self.update_status()
+        self.root.after(2000, self.refresh_status_loop)
 
     def add_to_startup(self):
         try:
@@ -528,31 +3729,6 @@ class ModernProcessMonitor:
                 messagebox.showinfo("Success", f"Added to startup!\nFile: {dest}")
         except Exception as e: messagebox.showerror("Error", f"Failed: {str(e)}")
 
-    def save_config(self):
-        clean_processes = []
-        for proc in self.processes:
-            clean_proc = proc.copy()
-            keys_to_remove = ['status_var', 'cpu_var', 'ram_var', 'restart_var', 'toggle_btn', 'monitoring']
-            for key in keys_to_remove:
-                if key in clean_proc: del clean_proc[key]
-            clean_processes.append(clean_proc)
-        
-        config = {"processes": clean_processes}
-        try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=4)
-        except Exception as e: print(f"Error saving config: {str(e)}")
-
-    def load_config(self):
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    self.processes = config.get("processes", [])
-            except Exception as e:
-                print(f"Error loading config: {str(e)}")
-                self.processes = []
-
     def on_closing(self):
         msg_box = tk.Toplevel(self.root)
         msg_box.title("Exit or Minimize?")
@@ -578,8 +3754,9 @@ class ModernProcessMonitor:
 
         def full_exit():
             msg_box.destroy()
-            for idx in list(self.monitor_threads.keys()):
-                self.stop_monitoring_process(idx)
+            for proc in list(self.processes):
+                if proc.get("monitoring"): self.stop_monitoring_process(proc)
+            self.engine.close()
             logging.info("Application exiting.")
             self.root.destroy()
 
@@ -590,10 +3767,130 @@ class ModernProcessMonitor:
         self.root.deiconify()
         logging.info("Application restored from widget.")
 
+CONTROL_USAGE = """control a running guardian:
+  list                     all entries with live status
+  status [ENTRY]           fleet summary, or one entry
+  start|stop|restart ENTRY start/stop monitoring, or restart the entry's tree
+  kill ENTRY               stop monitoring and terminate the tree
+  add PATH NAME [ARGS]     add an entry (--start starts it; put -- before ARGS with dashes)
+  remove ENTRY             remove an entry
+  history [ENTRY]          failures, restarts/hour and MTBF over --days (default 7)
+  output ENTRY             captured output tail (--crash: output saved with the last crash)
+  profile                  write the --profile file now, without stopping
+ENTRY is an entry id or a unique name"""
+
+def run_control(config_file, words, start=False, days=7, crash=False):
+    """CLI client for the control API; returns the process exit code"""
+    settings = {}
+    if os.path.exists(config_file):
+        with open(config_file, encoding="utf-8") as f:
+            settings = json.load(f).get("settings", {})
+    command, rest = words[0], words[1:]
+    request = {"cmd": command}
+    if command == "kill":
+        request = {"cmd": "stop", "kill": True}
+    if command == "add":
+        if len(rest) < 2:
+            print("usage: add PATH NAME [ARGS] [--start]", file=sys.stderr)
+            return 2
+        request["entry"] = {"path": os.path.abspath(rest[0]), "name": rest[1], "args": " ".join(rest[2:])}
+        request["start"] = start
+    elif rest:
+        request["id"] = rest[0]
+    if command == "history":
+        request["days"] = days
+    if command == "output":
+        request["crash"] = crash
+    
+    try:
+        reply = control_request(config_file, settings, request)
+    except (OSError, ControlError) as e:
+        if command == "history":
+            return print_stored_history(config_file, rest[0] if rest else None, days)
+        print(f"Cannot reach the guardian: {e}", file=sys.stderr)
+        return 1
+    if not reply.get("ok"):
+        print(f"Error: {reply.get('error')}", file=sys.stderr)
+        return 1
+    
+    result = reply["result"]
+    if command == "history":
+        print(history_text(result))
+    elif command == "output":
+        print(result, end="")
+    elif command == "list":
+        for entry in result:
+            state = "up" if entry["up"] else ("down" if entry["monitoring"] else "off")
+            cpu = f"{entry['cpu_percent']:.1f}%" if entry["cpu_percent"] is not None else "-"
+            rss = f"{entry['rss_bytes'] / 1024 / 1024:.1f}MB" if entry["rss_bytes"] is not None else "-"
+            print(f"{entry['id']}  {entry['name'][:24]:<24} {state:<5} {cpu:>7} {rss:>9}  restarts={entry['restarts']}"
+                  f"{'  QUARANTINED' if entry['quarantined'] else ''}")
+    else:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+def print_stored_history(config_file, entry, days):
+    """`history` without a running guardian: reads the event store straight from disk"""
+    processes = []
+    if os.path.exists(config_file):
+        with open(config_file, encoding="utf-8") as f:
+            processes = json.load(f).get("processes", [])
+    store = EventStore(os.path.splitext(config_file)[0] + ".events", readonly=True)
+    names = {proc["id"]: proc["name"] for proc in processes if "id" in proc}
+    entry_id = None
+    if entry:
+        matches = [i for i, name in names.items() if entry in (i, name)] or [i for i in store.ids if i == entry]
+        if len(matches) != 1:
+            print(f"Error: {'ambiguous' if matches else 'no such'} entry {entry!r}", file=sys.stderr)
+            return 1
+        entry_id = matches[0]
+    until = time.time()
+    print(history_text(store.report(until - days * 86400, until, names, entry_id)))
+    return 0
+
 def main():
-    root = tk.Tk()
-    app = ModernProcessMonitor(root)
-    root.mainloop()
+    parser = argparse.ArgumentParser(description="Process Guardian - keeps your apps running",
+                                     epilog=CONTROL_USAGE, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--headless", action="store_true", help="run without a window (daemon mode for servers)")
+    parser.add_argument("--config", default="guardian_config.json", help="configuration file (default: %(default)s)")
+    parser.add_argument("--profile", metavar="FILE", help="sample the guardian's threads and write folded stacks to FILE on exit")
+    parser.add_argument("--metrics-port", type=int, help="serve OpenMetrics on 127.0.0.1:PORT/metrics (overrides settings.metrics_port)")
+    parser.add_argument("--start", action="store_true", help="with the add command: start monitoring right away")
+    parser.add_argument("--crash", action="store_true", help="with the output command: show the output saved with the last crash")
+    parser.add_argument("--days", type=float, default=7, help="with the history command: window in days (default: %(default)s)")
+    parser.add_argument("command", nargs="*", help="control command for a running guardian (see below)")
+    args = parser.parse_args()
+    
+    if args.command:
+        sys.exit(run_control(args.config, args.command, args.start, args.days, args.crash))
+    
+    if args.headless:
+        # Mirror events to stderr so service managers (systemd, etc.) capture them
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', '%Y-%m-%d %H:%M:%S'))
+        logging.getLogger().addHandler(console)
+    
+    engine = GuardianEngine(args.config)
+    metrics_port = args.metrics_port or engine.settings.get("metrics_port")
+    if metrics_port:
+        engine.start_exporter(metrics_port, engine.settings.get("metrics_host", "127.0.0.1"))
+    engine.start_control()
+    
+    profiler = SamplingProfiler(args.profile) if args.profile else None
+    if profiler:
+        engine.profiler = profiler
+        if hasattr(signal, "SIGUSR1"): signal.signal(signal.SIGUSR1, lambda *_: profiler.dump_requested.set())
+    try:
+        if args.headless:
+            HeadlessGuardian(engine).run()
+            return
+        
+        load_gui()
+        root = tk.Tk()
+        app = ModernProcessMonitor(root, engine)
+        root.mainloop()
+    finally:
+        if profiler: profiler.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
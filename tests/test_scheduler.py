@@ -0,0 +1,55 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from process_guardian import MonitorScheduler
+
+
+def test_readd_during_check_runs_one_check_at_a_time():
+    """Stop then Start while a check is running must not start a second, overlapping check"""
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0, "calls": 0}
+    started = threading.Event()
+
+    def check(proc):
+        with lock:
+            state["running"] += 1
+            state["calls"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        started.set()
+        time.sleep(0.3)
+        with lock:
+            state["running"] -= 1
+        return 0.05
+
+    scheduler = MonitorScheduler(check)
+    proc = {"name": "entry"}
+    scheduler.add(proc)
+    assert started.wait(2)
+    scheduler.remove(proc)
+    scheduler.add(proc)
+    time.sleep(1.0)
+    scheduler.remove(proc)
+
+    assert state["peak"] == 1
+    assert state["calls"] >= 2  # The re-added entry keeps being checked
+
+
+def test_invalid_delay_keeps_entry_scheduled():
+    """A check returning a bad interval (e.g. a string from the config) must still be rescheduled"""
+    calls = []
+
+    def check(proc):
+        calls.append(time.monotonic())
+        return "abc" if len(calls) == 1 else 0.05
+
+    scheduler = MonitorScheduler(check)
+    scheduler.DEFAULT_DELAY = 0.05
+    proc = {"name": "entry"}
+    scheduler.add(proc)
+    time.sleep(0.5)
+    scheduler.remove(proc)
+
+    assert len(calls) >= 2
@@ -0,0 +1,37 @@
+import os
+import stat
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from process_guardian import write_atomic
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_keeps_existing_mode(tmp_path):
+    target = tmp_path / "config.json"
+    target.write_text("old")
+    os.chmod(target, 0o644)
+    write_atomic(str(target), "new")
+    assert target.read_text() == "new"
+    assert mode(target) == 0o644
+
+
+def test_new_file_gets_umask_mode(tmp_path):
+    umask = os.umask(0)
+    os.umask(umask)
+    target = tmp_path / "config.json"
+    write_atomic(str(target), "new")
+    assert mode(target) == 0o666 & ~umask
+
+
+def test_replaces_symlink_target(tmp_path):
+    real = tmp_path / "real.json"
+    real.write_text("old")
+    link = tmp_path / "link.json"
+    os.symlink(real, link)
+    write_atomic(str(link), "new")
+    assert link.is_symlink()
+    assert real.read_text() == "new"